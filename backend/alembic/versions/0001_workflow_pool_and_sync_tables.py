@@ -0,0 +1,57 @@
+"""Workflow pool columns, sync watermarks and user stats
+
+Brings databases created before these models up to date (the workflow pool
+columns plus the tables create_all added). Every step is idempotent, and tables
+that don't exist yet are left to create_all.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _table_exists(name: str) -> bool:
+    return op.get_bind().exec_driver_sql(f"SELECT to_regclass('{name}') IS NOT NULL").scalar()
+
+def upgrade():
+    if _table_exists("workflow_instances"):
+        op.execute("ALTER TABLE workflow_instances ADD COLUMN IF NOT EXISTS pool_key VARCHAR")
+        op.execute("ALTER TABLE workflow_instances ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP WITH TIME ZONE")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_workflow_instances_pool_key ON workflow_instances (pool_key)")
+
+    if _table_exists("user_credentials"):
+        op.execute("ALTER TABLE user_credentials ADD COLUMN IF NOT EXISTS fingerprint VARCHAR")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_user_credentials_fingerprint ON user_credentials (fingerprint)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sync_watermarks (
+            n8n_workflow_id VARCHAR PRIMARY KEY,
+            last_execution_id BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+
+    if _table_exists("users"):
+        op.execute("""
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id UUID PRIMARY KEY REFERENCES users (id),
+                active_automations INTEGER NOT NULL DEFAULT 0,
+                total_executions INTEGER NOT NULL DEFAULT 0,
+                successful_executions INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+        """)
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS user_stats")
+    op.execute("DROP TABLE IF EXISTS sync_watermarks")
+    op.execute("DROP INDEX IF EXISTS ix_user_credentials_fingerprint")
+    op.execute("ALTER TABLE IF EXISTS user_credentials DROP COLUMN IF EXISTS fingerprint")
+    op.execute("DROP INDEX IF EXISTS ix_workflow_instances_pool_key")
+    op.execute("ALTER TABLE IF EXISTS workflow_instances DROP COLUMN IF EXISTS last_used_at")
+    op.execute("ALTER TABLE IF EXISTS workflow_instances DROP COLUMN IF EXISTS pool_key")
@@ -0,0 +1,85 @@
+"""Secondary and composite indexes for the hot query paths
+
+Built CONCURRENTLY so the API and the sync keep writing while they build.
+Tables that don't exist yet are skipped; create_all builds them with these
+indexes (declared in app/models.py).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (table, index name, definition)
+INDEXES = [
+    # /executions history: keyset pagination per user on (started_at, id)
+    ("executions", "ix_executions_user_started",
+     "ON executions (user_id, started_at DESC, id DESC)"),
+    # Per-instance run counts and last run; attaching n8n runs to open executions
+    ("executions", "ix_executions_instance_started",
+     "ON executions (workflow_instance_id, started_at)"),
+    # Open runs only: execution watcher sweep and the running-set refresh
+    ("executions", "ix_executions_open",
+     "ON executions (started_at) WHERE status IN ('PENDING', 'RUNNING')"),
+    # Active automations per user, sync lookups by n8n workflow id
+    ("workflow_instances", "ix_workflow_instances_user_active",
+     "ON workflow_instances (user_id, is_active)"),
+    ("workflow_instances", "ix_workflow_instances_n8n_workflow_id",
+     "ON workflow_instances (n8n_workflow_id)"),
+    ("credit_transactions", "ix_credit_transactions_user_created",
+     "ON credit_transactions (user_id, created_at DESC)"),
+    ("automation_runs", "ix_automation_runs_user_created",
+     "ON automation_runs (user_id, created_at DESC)"),
+    # Public catalog: active tools, optionally by category
+    ("free_tools", "ix_free_tools_active_category",
+     "ON free_tools (is_active, category)"),
+]
+
+UNIQUE_N8N_EXECUTION = (
+    "ux_executions_n8n_execution_id",
+    "ON executions (n8n_execution_id) WHERE n8n_execution_id IS NOT NULL",
+)
+
+def _table_exists(name: str) -> bool:
+    return op.get_bind().exec_driver_sql(f"SELECT to_regclass('{name}') IS NOT NULL").scalar()
+
+def upgrade():
+    bind = op.get_bind()
+
+    # The unique index would fail half-built on duplicates; refuse with a clear message instead
+    if _table_exists("executions"):
+        duplicates = bind.exec_driver_sql("""
+            SELECT count(*) FROM (
+                SELECT n8n_execution_id FROM executions
+                WHERE n8n_execution_id IS NOT NULL
+                GROUP BY n8n_execution_id HAVING count(*) > 1
+            ) d
+        """).scalar()
+        if duplicates:
+            raise RuntimeError(
+                f"{duplicates} n8n execution ids are linked to more than one row in executions; "
+                "resolve them (SELECT n8n_execution_id FROM executions GROUP BY 1 HAVING count(*) > 1) "
+                "and run the migration again"
+            )
+
+    tables = {table for table, _, _ in INDEXES} | {"executions"}
+    existing = {table for table in tables if _table_exists(table)}
+
+    with op.get_context().autocommit_block():
+        for table, name, definition in INDEXES:
+            if table in existing:
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+        if "executions" in existing:
+            name, definition = UNIQUE_N8N_EXECUTION
+            op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {UNIQUE_N8N_EXECUTION[0]}")
+        for _, name, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,29 @@
+"""Covering index on n8n's execution_entity for the incremental sync
+
+Skipped when n8n keeps its tables in another database.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    exists = op.get_bind().exec_driver_sql("SELECT to_regclass('execution_entity') IS NOT NULL").scalar()
+    if not exists:
+        print("execution_entity not found, skipping the sync index")
+        return
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_execution_entity_workflow_id_id
+            ON execution_entity ("workflowId", id) INCLUDE ("startedAt", "stoppedAt", status)
+        """)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_execution_entity_workflow_id_id")
@@ -0,0 +1,18 @@
+"""Per-tool execution timeout
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("ALTER TABLE IF EXISTS free_tools ADD COLUMN IF NOT EXISTS timeout_seconds INTEGER")
+
+def downgrade():
+    op.execute("ALTER TABLE IF EXISTS free_tools DROP COLUMN IF EXISTS timeout_seconds")
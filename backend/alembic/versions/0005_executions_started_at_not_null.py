@@ -0,0 +1,22 @@
+"""executions.started_at is never NULL
+
+The history listing paginates on (started_at, id); a NULL start would end
+pagination early. Older n8n imports without a start time take their end time.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("UPDATE executions SET started_at = COALESCE(ended_at, now()) WHERE started_at IS NULL")
+    op.execute("ALTER TABLE executions ALTER COLUMN started_at SET NOT NULL")
+
+def downgrade():
+    op.execute("ALTER TABLE executions ALTER COLUMN started_at DROP NOT NULL")
@@ -0,0 +1,21 @@
+"""Mark webhook-only workflow instances
+
+Only webhook-only instances are garbage collected. Existing rows default to FALSE, so
+instances created before this revision (which may be scheduled) are never collected.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("ALTER TABLE IF EXISTS workflow_instances ADD COLUMN IF NOT EXISTS webhook_only BOOLEAN NOT NULL DEFAULT FALSE")
+
+def downgrade():
+    op.execute("ALTER TABLE IF EXISTS workflow_instances DROP COLUMN IF EXISTS webhook_only")
@@ -1,6 +1,6 @@
 # backend/app/core/security.py
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 from jose import jwt
 from passlib.context import CryptContext
 import os
@@ -9,11 +9,24 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 ALGORITHM = "HS256"
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_fastapi_key")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; hashes made with a different cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash); new hash is set when the stored one uses an outdated scheme or cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -2,7 +2,7 @@
 from typing import Annotated, Optional
 from fastapi import Depends, HTTPException, status, Request
 from ..routers.auth import get_current_user_optional
-from ..models import User
+from ..services.principal_cache import Principal
 import os
 import logging
 
@@ -10,8 +10,8 @@ logger = logging.getLogger("uvicorn")
 
 async def get_admin_user(
     request: Request,
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
-) -> User:
+    current_user: Annotated[Optional[Principal], Depends(get_current_user_optional)] = None
+) -> Principal:
     """
     Dependency that ensures the current user is an admin OR valid internal secret is provided.
     Raises 403 Forbidden if user is not authorized.
@@ -27,7 +27,7 @@ async def get_admin_user(
     if internal_secret and header_secret == internal_secret:
         # Create a dummy superuser for internal system actions
         logger.info("DEBUG AUTH: Authorized via Secret Key")
-        return User(id="system", email="system@flowsaas.com", is_admin=True)
+        return Principal(id="system", email="system@flowsaas.com", is_admin=True)
 
     # Standard User Authentication
     if not current_user:
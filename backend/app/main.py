@@ -8,11 +8,29 @@ async def lifespan(app: FastAPI):
     # Startup: Initialize database tables
     print("System Startup: Initializing services...")
     from .database import engine, Base
-    from .models import User, WorkflowInstance, RateLimit, Execution, CreditTransaction, UserCredential, WorkflowTemplate, FreeTool, AutomationRun
+    from .models import User, WorkflowInstance, RateLimit, Execution, CreditTransaction, UserCredential, WorkflowTemplate, FreeTool, AutomationRun, SyncWatermark, UserStats
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    from .services.user_stats import install_user_stats_triggers
+    install_user_stats_triggers()
+    from .services.tool_executor import bootstrap_tool_runtime
+    print(f"Tool runtime ready in {bootstrap_tool_runtime() * 1000:.1f} ms")
+    from .services.tool_pool import tool_pool
+    tool_pool.start()
+    from .services.usage_counter import usage_counter
+    usage_counter.start()
+    from .services.n8n_client import n8n_client
+    n8n_client.start()
+    from .services.execution_watcher import execution_watcher
+    execution_watcher.start()
     yield
     # Shutdown
+    await execution_watcher.stop()
+    await usage_counter.stop()
+    await n8n_client.aclose()
+    tool_pool.shutdown()
+    from .services.password_hasher import password_hasher
+    password_hasher.shutdown()
     print("System Shutdown")
 
 app = FastAPI(title="FlowSaaS API", version="0.1.0", lifespan=lifespan)
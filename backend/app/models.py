@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, UUID, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, UUID, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -31,7 +31,14 @@ class WorkflowInstance(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     template_id = Column(String) # Reference to immutable template ID
     is_active = Column(Boolean, default=True)
-    n8n_workflow_id = Column(String) # ID in n8n engine
+    n8n_workflow_id = Column(String, index=True) # ID in n8n engine
+    pool_key = Column(String, nullable=True, index=True) # Set when runs with the same credentials share the instance
+    webhook_only = Column(Boolean, default=False) # Started only by its webhook; idle ones are garbage collected
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_workflow_instances_user_active", user_id, is_active),
+    )
 
     # owner = relationship("User", back_populates="workflows")
     rate_limit = relationship("RateLimit", uselist=False, back_populates="workflow_instance")
@@ -53,13 +60,48 @@ class Execution(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     status = Column(String, default=ExecutionStatus.PENDING)
     credits_used = Column(Integer, default=0)
-    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Keyset pagination key
     ended_at = Column(DateTime(timezone=True), nullable=True)
     error_message = Column(String, nullable=True)
     n8n_execution_id = Column(String, nullable=True) # To track external sync
 
+    __table_args__ = (
+        # History listing: keyset pagination per user on (started_at, id)
+        Index("ix_executions_user_started", user_id, started_at.desc(), id.desc()),
+        # Per-instance run counts / last run, and attaching n8n runs to open executions
+        Index("ix_executions_instance_started", workflow_instance_id, started_at),
+        # One row per n8n execution, so sync inserts are idempotent
+        Index("ux_executions_n8n_execution_id", n8n_execution_id, unique=True,
+              postgresql_where=n8n_execution_id.isnot(None)),
+        # The small set of open runs the watcher and the running-set refresh look at
+        Index("ix_executions_open", started_at,
+              postgresql_where=status.in_([ExecutionStatus.PENDING.value, ExecutionStatus.RUNNING.value])),
+    )
+
     user = relationship("User", back_populates="executions")
 
+class SyncWatermark(Base):
+    """
+    High-water mark of the n8n execution sync, per n8n workflow.
+    Only execution_entity rows with a higher id are fetched on the next pass.
+    """
+    __tablename__ = "sync_watermarks"
+    n8n_workflow_id = Column(String, primary_key=True)
+    last_execution_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserStats(Base):
+    """
+    Per-user dashboard counters (served by /auth/me in one primary key lookup).
+    Kept current by triggers on executions and workflow_instances, see services/user_stats.py.
+    """
+    __tablename__ = "user_stats"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    active_automations = Column(Integer, nullable=False, default=0)
+    total_executions = Column(Integer, nullable=False, default=0)
+    successful_executions = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class CreditTransaction(Base):
     """
     Append-only ledger for credit history.
@@ -74,6 +116,10 @@ class CreditTransaction(Base):
     
     balance_after = Column(Integer) # Snapshot of balance for quick auditing
 
+    __table_args__ = (
+        Index("ix_credit_transactions_user_created", user_id, created_at.desc()),
+    )
+
     user = relationship("User", back_populates="transactions")
 
 class UserCredential(Base):
@@ -87,6 +133,7 @@ class UserCredential(Base):
     name = Column(String) # Friendly name e.g. "My Personal Slack"
     credential_type = Column(String) # n8n credential type e.g. "slackApi"
     n8n_credential_id = Column(String) # The ID in n8n
+    fingerprint = Column(String, nullable=True, index=True) # HMAC of type + secret, to reuse the n8n credential
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="credentials")
@@ -137,6 +184,7 @@ class FreeTool(Base):
     input_schema = Column(String, nullable=True)  # JSON schema for user inputs
     is_active = Column(Boolean, default=False)
     usage_count = Column(Integer, default=0)
+    timeout_seconds = Column(Integer, nullable=True)  # Per-tool limit; TOOL_TIMEOUT_SECONDS when unset
     
     # SEO Fields
     seo_title = Column(String, nullable=True)
@@ -149,6 +197,11 @@ class FreeTool(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Public catalog: active tools, optionally by category
+        Index("ix_free_tools_active_category", is_active, category),
+    )
+
 
 
 
@@ -187,6 +240,10 @@ class AutomationRun(Base):
     
     # Metadata
     parameters = Column(String)  # JSON as string for tool-specific params
+
+    __table_args__ = (
+        Index("ix_automation_runs_user_created", user_id, created_at.desc()),
+    )
     
     # Relationship
     user = relationship("User", back_populates="automation_runs")
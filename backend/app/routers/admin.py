@@ -6,6 +6,7 @@ from uuid import UUID
 from ..database import get_db
 from ..models import User, WorkflowTemplate
 from ..guards.admin_guard import get_admin_user
+from ..services.principal_cache import Principal
 from ..schemas import (
     WorkflowTemplateUpload,
     WorkflowTemplateUpdate,
@@ -21,7 +22,7 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 @router.post("/templates/upload", response_model=WorkflowTemplateResponse)
 async def upload_workflow_template(
     upload: WorkflowTemplateUpload,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -43,7 +44,7 @@ async def upload_workflow_template(
 
 @router.get("/templates", response_model=List[WorkflowTemplateResponse])
 async def list_all_templates(
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -56,7 +57,7 @@ async def list_all_templates(
 @router.get("/templates/{template_id}", response_model=WorkflowTemplateResponse)
 async def get_template(
     template_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -71,7 +72,7 @@ async def get_template(
 async def update_template(
     template_id: UUID,
     update: WorkflowTemplateUpdate,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -93,7 +94,7 @@ async def update_template(
 async def test_template(
     template_id: UUID,
     test_request: WorkflowTestRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -110,7 +111,7 @@ async def test_template(
 @router.post("/templates/{template_id}/activate", response_model=WorkflowTemplateResponse)
 async def activate_template(
     template_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -123,7 +124,7 @@ async def activate_template(
 @router.post("/templates/{template_id}/deactivate", response_model=WorkflowTemplateResponse)
 async def deactivate_template(
     template_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -135,7 +136,7 @@ async def deactivate_template(
 @router.delete("/templates/{template_id}")
 async def delete_template(
     template_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -146,7 +147,7 @@ async def delete_template(
 
 @router.get("/n8n/workflows")
 async def list_n8n_workflows(
-    admin_user: Annotated[User, Depends(get_admin_user)]
+    admin_user: Annotated[Principal, Depends(get_admin_user)]
 ):
     """
     List all workflows in our n8n instance.
@@ -155,11 +156,21 @@ async def list_n8n_workflows(
     workflows = await n8n_client.list_workflows()
     return workflows
 
+@router.get("/password-hashing")
+async def password_hashing_stats(
+    admin_user: Annotated[Principal, Depends(get_admin_user)]
+):
+    """
+    Load on the password hashing executor (queue depth, rejections).
+    """
+    from ..services.password_hasher import password_hasher
+    return password_hasher.stats()
+
 @router.post("/users/{user_email}/add-credits")
 async def add_credits_to_user(
     user_email: str,
     credits: int,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -5,8 +5,11 @@ from typing import Annotated
 from pydantic import BaseModel
 from uuid import UUID
 from ..database import get_db
-from ..models import User, FreeTool
+from ..models import FreeTool
 from ..guards.admin_guard import get_admin_user
+from ..services.principal_cache import Principal
+from ..services.tool_executor import invalidate_tool_cache
+from ..services.tool_catalog import tool_catalog
 
 router = APIRouter(prefix="/admin/tools", tags=["admin-tools"])
 
@@ -19,6 +22,7 @@ class ToolUpload(BaseModel):
     input_type: str
     output_type: str
     python_code: str
+    timeout_seconds: int = None
     seo_title: str = None
     seo_description: str = None
     seo_keywords: str = None
@@ -29,6 +33,7 @@ class ToolUpdate(BaseModel):
     category: str = None
     icon: str = None
     is_active: bool = None
+    timeout_seconds: int = None
     seo_title: str = None
     seo_description: str = None
     seo_keywords: str = None
@@ -36,7 +41,7 @@ class ToolUpdate(BaseModel):
 @router.post("/upload")
 def upload_tool(
     tool_data: ToolUpload,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Upload a new tool"""
@@ -64,12 +69,13 @@ def upload_tool(
     db.add(tool)
     db.commit()
     db.refresh(tool)
+    tool_catalog.invalidate()
     
     return {"success": True, "tool_id": str(tool.id), "message": "Tool uploaded and dependencies installed"}
 
 @router.get("/")
 def list_all_tools_admin(
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """List all tools (including inactive)"""
@@ -80,7 +86,7 @@ def list_all_tools_admin(
 def update_tool(
     tool_id: UUID,
     updates: ToolUpdate,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Update tool metadata"""
@@ -93,13 +99,15 @@ def update_tool(
     
     db.commit()
     db.refresh(tool)
+    invalidate_tool_cache(tool.id)
+    tool_catalog.invalidate()
     
     return {"success": True, "message": "Tool updated successfully"}
 
 @router.post("/{tool_id}/activate")
 def activate_tool(
     tool_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Activate a tool"""
@@ -109,13 +117,14 @@ def activate_tool(
     
     tool.is_active = True
     db.commit()
+    tool_catalog.invalidate()
     
     return {"success": True, "message": "Tool activated"}
 
 @router.post("/{tool_id}/deactivate")
 def deactivate_tool(
     tool_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Deactivate a tool"""
@@ -125,13 +134,14 @@ def deactivate_tool(
     
     tool.is_active = False
     db.commit()
+    tool_catalog.invalidate()
     
     return {"success": True, "message": "Tool deactivated"}
 
 @router.delete("/{tool_id}")
 def delete_tool(
     tool_id: UUID,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Delete a tool"""
@@ -141,5 +151,7 @@ def delete_tool(
     
     db.delete(tool)
     db.commit()
+    invalidate_tool_cache(tool_id)
+    tool_catalog.invalidate()
     
     return {"success": True, "message": "Tool deleted"}
@@ -4,9 +4,11 @@ from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, Annotated
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import User
 from app.guards.admin_guard import get_admin_user
+from app.services.principal_cache import Principal
 from app.services.ai_service import AIWorkflowFactory
+from app.services.tool_executor import invalidate_tool_cache
+from app.services.tool_catalog import tool_catalog
 import json
 import subprocess
 import sys
@@ -55,14 +57,14 @@ class SaveToolRequest(BaseModel):
     seo_keywords: Optional[str] = None
 
 @router.get("/providers")
-async def get_providers(admin_user: Annotated[User, Depends(get_admin_user)]):
+async def get_providers(admin_user: Annotated[Principal, Depends(get_admin_user)]):
     """Get list of available AI providers configured in the system."""
     return {"providers": AIWorkflowFactory.get_available_providers()}
 
 @router.post("/generate", response_model=GenerateToolResponse)
 async def generate_tool(
     request: GenerateToolRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)]
+    admin_user: Annotated[Principal, Depends(get_admin_user)]
 ):
     """Generate a Python tool from a natural language prompt."""
     try:
@@ -91,7 +93,7 @@ async def generate_tool(
 @router.post("/test", response_model=TestToolResponse)
 async def test_tool(
     request: TestToolRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)]
+    admin_user: Annotated[Principal, Depends(get_admin_user)]
 ):
     """Test the generated tool code with provided inputs in a sandbox environment."""
     try:
@@ -171,7 +173,7 @@ except Exception as e:
 @router.post("/save")
 async def save_tool(
     request: SaveToolRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Save the generated tool to the database."""
@@ -217,6 +219,8 @@ async def save_tool(
         db.add(tool)
         db.commit()
         db.refresh(tool)
+        invalidate_tool_cache(tool.id)
+        tool_catalog.invalidate()
         
         return {
             "success": True,
@@ -4,8 +4,8 @@ from pydantic import BaseModel
 from typing import List, Dict, Any, Optional, Annotated
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import User
 from app.guards.admin_guard import get_admin_user
+from app.services.principal_cache import Principal
 from app.services.ai_service import AIWorkflowFactory
 from app.services.admin_service import admin_service
 import json
@@ -34,14 +34,14 @@ class SaveWorkflowRequest(BaseModel):
     is_active: bool = False
 
 @router.get("/providers")
-async def get_providers(admin_user: Annotated[User, Depends(get_admin_user)]):
+async def get_providers(admin_user: Annotated[Principal, Depends(get_admin_user)]):
     """Get list of available AI providers configured in the system."""
     return {"providers": AIWorkflowFactory.get_available_providers()}
 
 @router.post("/generate", response_model=GenerateWorkflowResponse)
 async def generate_workflow(
     request: GenerateWorkflowRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)]
+    admin_user: Annotated[Principal, Depends(get_admin_user)]
 ):
     """Generate an n8n workflow and schema based on a prompt."""
     try:
@@ -71,7 +71,7 @@ async def generate_workflow(
 @router.post("/save")
 async def save_workflow(
     request: SaveWorkflowRequest,
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """Save the generated workflow and schema as a template."""
@@ -4,61 +4,93 @@ from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..database import get_db
 from ..models import User
 from ..schemas import Token, UserCreate
-from ..core.security import create_access_token, get_password_hash, verify_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..core.security import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from jose import JWTError, jwt
 from ..core.security import SECRET_KEY, ALGORITHM
+from ..services.principal_cache import Principal, principal_cache
+from ..services.password_hasher import password_hasher
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
-async def get_current_user_optional(token: Annotated[Optional[str], Depends(OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False))], db: Session = Depends(get_db)):
+def _token_subject(token: Optional[str]) -> Optional[str]:
     if not token:
         return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
     except JWTError:
         return None
-    
-    user = db.query(User).filter(User.email == email).first()
+    return payload.get("sub")
+
+def _load_principal(email: str, db: Session) -> Optional[Principal]:
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        principal_cache.put(principal)
+    return principal
+
+# Auth dependencies are plain functions: the principal cache (sync Redis) and the
+# fallback query run in FastAPI's threadpool instead of on the event loop
+def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)) -> Principal:
+    """Authenticated user as a Principal, served from the principal cache when possible."""
+    email = _token_subject(token)
+    principal = _load_principal(email, db) if email else None
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+def get_current_user_record(current_user: Annotated[Principal, Depends(get_current_user)], db: Session = Depends(get_db)) -> User:
+    """The authenticated user's ORM row, for routes that modify it."""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        principal_cache.invalidate(current_user.email)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+def get_current_user_optional(token: Annotated[Optional[str], Depends(OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False))], db: Session = Depends(get_db)) -> Optional[Principal]:
+    email = _token_subject(token)
+    return _load_principal(email, db) if email else None
+
+def _find_user(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def _create_user(db: Session, email: str, hashed_password: str) -> User:
+    new_user = User(email=email, hashed_password=hashed_password)
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+def _update_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
 @router.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
+    # Database work runs in the threadpool, hashing on the password executor;
+    # the event loop only awaits
+    db_user = await run_in_threadpool(_find_user, db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
-    new_user = User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    hashed_password = await password_hasher.hash(user.password)
+    new_user = await run_in_threadpool(_create_user, db, user.email, hashed_password)
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -67,44 +99,43 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=Token)
-def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, form_data.username)
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Read before the commit below expires the row
+    email = user.email
+
+    # Stored hash uses an outdated cost factor: upgrade it while we have the password
+    if new_hash:
+        await run_in_threadpool(_update_password_hash, db, user, new_hash)
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me")
 def read_users_me(
-    current_user: Annotated[User, Depends(get_current_user)], 
+    current_user: Annotated[Principal, Depends(get_current_user)], 
     db: Session = Depends(get_db)  # Inject DB session
 ):
-    from ..models import WorkflowInstance, Execution, ExecutionStatus
+    from ..services.user_stats import get_user_stats
     
-    # 1. Count Active Automations
-    active_automations_count = db.query(WorkflowInstance).filter(
-        WorkflowInstance.user_id == current_user.id,
-        WorkflowInstance.is_active == True
-    ).count()
-
-    # 2. Total Executions
-    total_executions_count = db.query(Execution).filter(
-        Execution.user_id == current_user.id
-    ).count()
-
-    # 3. Success Rate
-    success_count = db.query(Execution).filter(
-        Execution.user_id == current_user.id,
-        Execution.status == ExecutionStatus.SUCCESS
-    ).count()
+    # Active automations, total executions and successes from the per-user counters
+    stats = get_user_stats(current_user.id, db)
+    active_automations_count = stats["active_automations"]
+    total_executions_count = stats["total_executions"]
+    success_count = stats["successful_executions"]
 
     success_rate = 0
     if total_executions_count > 0:
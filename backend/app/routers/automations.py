@@ -5,8 +5,9 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, UUID4
 from datetime import datetime
 from ..database import get_db
-from ..models import AutomationRun, User
+from ..models import AutomationRun
 from ..routers.auth import get_current_user
+from ..services.principal_cache import Principal
 
 router = APIRouter(prefix="/automations", tags=["automations"])
 
@@ -44,7 +45,7 @@ class AutomationResponse(BaseModel):
 @router.post("/run", response_model=AutomationResponse)
 async def create_automation(
     automation: AutomationCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -98,7 +99,7 @@ async def create_automation(
 
 @router.get("/user", response_model=List[AutomationResponse])
 async def list_user_automations(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -115,7 +116,7 @@ async def list_user_automations(
 @router.get("/{automation_id}", response_model=AutomationResponse)
 async def get_automation_status(
     automation_id: UUID4,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -135,7 +136,7 @@ async def get_automation_status(
 @router.get("/{automation_id}/result")
 async def get_automation_result(
     automation_id: UUID4,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -168,7 +169,7 @@ async def get_automation_result(
 @router.delete("/{automation_id}")
 async def cancel_automation(
     automation_id: UUID4,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1,18 +1,25 @@
 # backend/app/routers/executions.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import cast, func, String, text, tuple_
 from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
-from ..database import get_db
-from ..models import User, WorkflowInstance
+import asyncio
+import base64
+from ..database import engine, get_db
+from ..models import WorkflowInstance, ExecutionStatus
 from ..worker import execute_workflow_task
 from .auth import get_current_user
+from ..services.principal_cache import Principal
 
 router = APIRouter(prefix="/executions", tags=["executions"])
 
 @router.post("/{workflow_instance_id}")
 def trigger_execution(
     workflow_instance_id: str, 
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify ownership (Mock check since we didn't fully implement WorkflowInstance creation API yet)
@@ -32,134 +39,257 @@ def trigger_execution(
     
     return {"status": "queued", "task_id": str(task.id)}
 
+def _encode_cursor(started_at: datetime, execution_id) -> str:
+    raw = f"{started_at.isoformat()}|{execution_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        started_at, execution_id = raw.split("|", 1)
+        return datetime.fromisoformat(started_at), UUID(execution_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/")
-def list_my_executions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_my_executions(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[ExecutionStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    Returns execution history with workflow details.
-    Manually aggregates WorkflowInstance and WorkflowTemplate data.
+    Returns execution history with workflow details, newest first.
+    One joined query per page; pages are keyset-paginated on (started_at, id).
+    Pass the X-Next-Cursor response header back as ?cursor= for the next page.
     """
-    from ..models import Execution, WorkflowInstance, WorkflowTemplate
-    from ..services.sync_service import sync_executions_for_user
-    
-    # Sync first (optional, can be heavy)
-    # sync_executions_for_user(current_user.id, db)
-    
-    executions = db.query(Execution).filter(
+    from ..models import Execution, WorkflowTemplate
+
+    query = db.query(
+        Execution,
+        WorkflowTemplate.id.label("template_id"),
+        WorkflowTemplate.name.label("template_name")
+    ).outerjoin(
+        WorkflowInstance, WorkflowInstance.id == Execution.workflow_instance_id
+    ).outerjoin(
+        # template_id is stored as a string on instances
+        WorkflowTemplate, cast(WorkflowTemplate.id, String) == WorkflowInstance.template_id
+    ).filter(
         Execution.user_id == current_user.id
-    ).order_by(Execution.started_at.desc()).limit(20).all()
-    
-    results = []
-    for exc in executions:
-        workflow_name = "Unknown Workflow"
-        template_id = None
-        
-        # Manual fetch relationship (N+1 but safe for small limits)
-        if exc.workflow_instance_id:
-            instance = db.query(WorkflowInstance).filter(WorkflowInstance.id == exc.workflow_instance_id).first()
-            if instance:
-                if instance.template_id:
-                     # Try to parse UUID or string
-                    try:
-                        tmpl = db.query(WorkflowTemplate).filter(WorkflowTemplate.id == UUID(instance.template_id)).first()
-                        if tmpl:
-                            workflow_name = tmpl.name
-                            template_id = str(tmpl.id)
-                    except:
-                        pass
-        
-        results.append({
+    )
+
+    if status:
+        query = query.filter(Execution.status == status.value)
+    if since:
+        query = query.filter(Execution.started_at >= since)
+    if until:
+        query = query.filter(Execution.started_at < until)
+    if cursor:
+        cursor_started_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(Execution.started_at, Execution.id) < tuple_(cursor_started_at, cursor_id))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(Execution.started_at.desc(), Execution.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1].Execution
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.started_at, last.id)
+
+    return [
+        {
             "id": exc.id,
             "status": exc.status,
             "credits_used": exc.credits_used,
             "started_at": exc.started_at,
             "ended_at": exc.ended_at,
             "error_message": exc.error_message,
-            "workflow_name": workflow_name,
-            "template_id": template_id,
+            "workflow_name": template_name or "Unknown Workflow",
+            "template_id": str(template_id) if template_id else None,
             "n8n_execution_id": exc.n8n_execution_id
-        })
-    
-    return results
+        }
+        for exc, template_id, template_name in rows
+    ]
+
+@router.get("/{execution_id}/status")
+async def get_execution_status(
+    execution_id: UUID,
+    wait: float = 0,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cheap status check for a run, served from our own table.
+    With wait > 0 the request is held (up to EXECUTION_WAIT_MAX_SECONDS) until
+    n8n reports progress for the run, so clients can long-poll instead of spinning.
+    """
+    from ..models import Execution, ExecutionStatus
+    from ..services.execution_watcher import execution_watcher, EXECUTION_WAIT_MAX_SECONDS
+
+    def load():
+        return db.query(Execution, WorkflowInstance.n8n_workflow_id).outerjoin(
+            WorkflowInstance, WorkflowInstance.id == Execution.workflow_instance_id
+        ).filter(
+            Execution.id == execution_id,
+            Execution.user_id == current_user.id
+        ).first()
+
+    row = load()
+    if not row:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    exc, n8n_workflow_id = row
+
+    is_open = exc.status in (ExecutionStatus.PENDING, ExecutionStatus.RUNNING)
+    if wait > 0 and is_open and n8n_workflow_id:
+        if await execution_watcher.wait(n8n_workflow_id, min(wait, EXECUTION_WAIT_MAX_SECONDS)):
+            db.expire_all()
+            exc, _ = load()
+
+    return {
+        "execution_id": str(exc.id),
+        "status": exc.status,
+        "n8n_execution_id": exc.n8n_execution_id,
+        "started_at": exc.started_at,
+        "ended_at": exc.ended_at,
+        "error_message": exc.error_message
+    }
+
+def _n8n_workflow_stats(n8n_workflow_id: str):
+    """
+    (updatedAt, execution count, latest execution id) of an n8n workflow, read from
+    n8n's own tables, or None when they are not reachable from our database.
+    Uses its own connection so a failure can't abort the request's transaction.
+    """
+    try:
+        with engine.connect() as conn:
+            return tuple(conn.execute(text("""
+                SELECT
+                    (SELECT "updatedAt" FROM workflow_entity WHERE id::text = :workflow_id),
+                    (SELECT count(*) FROM execution_entity WHERE "workflowId" = :workflow_id),
+                    (SELECT max(id) FROM execution_entity WHERE "workflowId" = :workflow_id)
+            """), {"workflow_id": str(n8n_workflow_id)}).one())
+    except Exception as e:
+        print(f"Could not read n8n workflow stats, using the API: {e}")
+        return None
+
+def _link_n8n_execution(db: Session, exc, n8n_execution_id: str):
+    """Store the n8n execution on this run unless another row already owns it (ids are unique)."""
+    from ..models import Execution
+    owner = db.query(Execution.id).filter(Execution.n8n_execution_id == n8n_execution_id).first()
+    if owner is None:
+        exc.n8n_execution_id = n8n_execution_id
+        db.commit()
+
+def _load_execution_details(db: Session, execution_id: UUID, user_id):
+    """
+    The execution (as a plain dict), its n8n workflow id, template name, and the
+    instance's run count and previous run time. None when not found.
+    """
+    from ..models import Execution, WorkflowTemplate
+
+    # Execution, its instance and template name in one query
+    row = db.query(
+        Execution,
+        WorkflowInstance.n8n_workflow_id,
+        WorkflowTemplate.name
+    ).outerjoin(
+        WorkflowInstance, WorkflowInstance.id == Execution.workflow_instance_id
+    ).outerjoin(
+        WorkflowTemplate, cast(WorkflowTemplate.id, String) == WorkflowInstance.template_id
+    ).filter(
+        Execution.id == execution_id,
+        Execution.user_id == user_id
+    ).first()
+    if not row:
+        return None
+    exc, n8n_workflow_id, template_name = row
+
+    total_runs, last_run_at = 0, None
+    if exc.workflow_instance_id:
+        # Run count and previous run time for this workflow instance in one pass
+        total_runs, last_run_at = db.query(
+            func.count(Execution.id),
+            func.max(Execution.started_at).filter(Execution.id != execution_id)
+        ).filter(
+            Execution.workflow_instance_id == exc.workflow_instance_id
+        ).one()
+
+    execution = {
+        "id": str(exc.id),
+        "status": exc.status,
+        "started_at": exc.started_at.isoformat() if exc.started_at else None,
+        "ended_at": exc.ended_at.isoformat() if exc.ended_at else None,
+        "credits_used": exc.credits_used,
+        "error_message": exc.error_message,
+        "n8n_execution_id": exc.n8n_execution_id,
+    }
+    return exc, execution, n8n_workflow_id, template_name, total_runs, last_run_at
 
 @router.get("/{execution_id}/details")
 async def get_execution_details(
     execution_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get detailed execution with visual workflow graph.
     Returns execution metadata + workflow structure + node statuses.
+    Database work runs in the threadpool; only the n8n calls are awaited here.
     """
-    from ..models import Execution, WorkflowInstance, WorkflowTemplate
     from ..services.n8n_client import n8n_client
-    
-    exc = db.query(Execution).filter(
-        Execution.id == execution_id,
-        Execution.user_id == current_user.id
-    ).first()
-    
-    if not exc:
+
+    loaded = await run_in_threadpool(_load_execution_details, db, execution_id, current_user.id)
+    if not loaded:
         raise HTTPException(status_code=404, detail="Execution not found")
+    exc, execution, n8n_workflow_id, template_name, total_runs, last_run_at = loaded
 
     # Fetch workflow metadata
-    workflow_name = "Unknown Workflow"
+    workflow_name = template_name or "Unknown Workflow"
     trigger_type = "manual"
-    total_runs = 0
-    last_run_at = None
-    n8n_workflow_id = None
-    
-    if exc.workflow_instance_id:
-        instance = db.query(WorkflowInstance).filter(
-            WorkflowInstance.id == exc.workflow_instance_id
-        ).first()
-        
-        if instance:
-            n8n_workflow_id = instance.n8n_workflow_id
-            
-            # Get template info
-            if instance.template_id:
-                try:
-                    tmpl = db.query(WorkflowTemplate).filter(
-                        WorkflowTemplate.id == UUID(instance.template_id)
-                    ).first()
-                    if tmpl:
-                        workflow_name = tmpl.name
-                except:
-                    pass
-            
-            # Count total runs for this workflow instance
-            total_runs = db.query(Execution).filter(
-                Execution.workflow_instance_id == instance.id
-            ).count()
-            
-            # Get last run time
-            last_exec = db.query(Execution).filter(
-                Execution.workflow_instance_id == instance.id,
-                Execution.id != execution_id
-            ).order_by(Execution.started_at.desc()).first()
-            
-            if last_exec:
-                last_run_at = last_exec.started_at
 
     # Fetch n8n execution data and workflow structure
     graph_data = {"nodes": [], "connections": []}
     n8n_execution_data = None
-    n8n_execution_id = exc.n8n_execution_id
+    n8n_execution_id = execution.pop("n8n_execution_id")
     
     if n8n_workflow_id:
         try:
-            # Fetch workflow structure first
-            workflow_structure = await n8n_client.get_workflow(n8n_workflow_id)
-            
-            # Fetch ALL executions for this workflow from n8n to get accurate count
-            print(f"Fetching all executions for workflow {n8n_workflow_id} to get live count")
-            executions_list = await n8n_client.list_executions(workflow_id=n8n_workflow_id)
-            
-            # Update total_runs with LIVE count from n8n
-            if executions_list.get("data"):
-                total_runs = len(executions_list["data"])
-                print(f"Live execution count from n8n: {total_runs}")
+            # Live run count, latest execution and workflow version straight from
+            # n8n's tables (same database), so the API is only hit for bodies
+            workflow_updated_at = None
+            live = await run_in_threadpool(_n8n_workflow_stats, n8n_workflow_id)
+            if live:
+                workflow_updated_at, total_runs, latest_execution_id = live
+                if not n8n_execution_id and latest_execution_id is not None:
+                    n8n_execution_id = str(latest_execution_id)
+                    await run_in_threadpool(_link_n8n_execution, db, exc, n8n_execution_id)
+
+            # Independent n8n calls go out together; unchanged workflows and
+            # finished executions are served from cache
+            calls = [n8n_client.get_workflow_version(n8n_workflow_id, workflow_updated_at)]
+            if n8n_execution_id:
+                calls.append(n8n_client.get_finished_execution_result(n8n_execution_id))
+            elif not live:
+                calls.append(n8n_client.list_executions(workflow_id=n8n_workflow_id))
+            results = await asyncio.gather(*calls)
+            workflow_structure = results[0]
+
+            if not n8n_execution_id and not live:
+                # Fallback without access to n8n's tables: use the API listing
+                executions_list = results[1]
+                if executions_list.get("data"):
+                    total_runs = len(executions_list["data"])
+                    n8n_execution_id = str(executions_list["data"][0].get("id"))
+                    print(f"Found latest execution: {n8n_execution_id}")
+                    await run_in_threadpool(_link_n8n_execution, db, exc, n8n_execution_id)
+                    n8n_execution_data = await n8n_client.get_finished_execution_result(n8n_execution_id)
+                else:
+                    print("No executions found in n8n for this workflow")
+            elif n8n_execution_id:
+                n8n_execution_data = results[1]
             
             # Determine trigger type from workflow
             if workflow_structure.get("nodes"):
@@ -170,33 +300,8 @@ async def get_execution_details(
                 elif "webhook" in node_type.lower():
                     trigger_type = "webhook"
             
-            # If we don't have an execution ID, fetch the latest one from n8n
-            if not n8n_execution_id:
-                print(f"No stored execution ID, fetching latest from n8n for workflow {n8n_workflow_id}")
-                
-                if executions_list.get("data") and len(executions_list["data"]) > 0:
-                    latest_exec = executions_list["data"][0]
-                    n8n_execution_id = str(latest_exec.get("id"))
-                    print(f"Found latest execution: {n8n_execution_id}")
-                    
-                    # Update the database with this execution ID
-                    exc.n8n_execution_id = n8n_execution_id
-                    db.commit()
-                else:
-                    print("No executions found in n8n for this workflow")
-            
-            # Now fetch execution data if we have an ID
-            if n8n_execution_id:
-                print(f"Fetching execution data for {n8n_execution_id}")
-                n8n_execution_data = await n8n_client.get_execution_result(n8n_execution_id)
-                
-                # Parse into graph with execution status
-                graph_data = n8n_client.parse_workflow_graph(workflow_structure, n8n_execution_data)
-                print(f"Graph parsed: {len(graph_data['nodes'])} nodes, {len(graph_data['connections'])} connections")
-            else:
-                # No execution yet, just show the workflow structure without status
-                graph_data = n8n_client.parse_workflow_graph(workflow_structure, None)
-                print(f"No execution data, showing workflow structure only")
+            # Parse into graph with execution status (structure only when there is no execution yet)
+            graph_data = n8n_client.parse_workflow_graph(workflow_structure, n8n_execution_data)
                     
         except Exception as e:
             print(f"Failed to fetch n8n details: {e}")
@@ -205,14 +310,7 @@ async def get_execution_details(
             # Continue with empty graph
     
     return {
-        "execution": {
-            "id": str(exc.id),
-            "status": exc.status,
-            "started_at": exc.started_at.isoformat() if exc.started_at else None,
-            "ended_at": exc.ended_at.isoformat() if exc.ended_at else None,
-            "credits_used": exc.credits_used,
-            "error_message": exc.error_message
-        },
+        "execution": execution,
         "workflow": {
             "id": n8n_workflow_id,
             "name": workflow_name,
@@ -4,8 +4,8 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Annotated
 from ..database import get_db
-from ..models import User
 from ..routers.auth import get_current_user
+from ..services.principal_cache import Principal
 from ..services.payment_service import payment_service
 from ..services.credit_ledger import record_transaction
 import uuid
@@ -42,7 +42,7 @@ def get_packages():
 @router.post("/create-order")
 def create_order(
     request: CreateOrderRequest,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     """Create a Razorpay order for credit purchase"""
     if request.package_id not in CREDIT_PACKAGES:
@@ -66,7 +66,7 @@ def create_order(
 @router.post("/verify")
 def verify_payment(
     request: VerifyPaymentRequest,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
     """Verify payment and add credits to user account"""
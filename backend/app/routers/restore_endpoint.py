@@ -6,15 +6,17 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import Annotated
 from ..database import get_db
-from ..models import WorkflowTemplate, FreeTool, User
+from ..models import WorkflowTemplate, FreeTool
 from ..guards.admin_guard import get_admin_user
+from ..services.principal_cache import Principal
 from ..services.n8n_client import n8n_client
+from ..services.tool_catalog import tool_catalog
 
 router = APIRouter(prefix="/admin", tags=["admin-restore"])
 
 @router.post("/restore-from-backup")
 async def restore_from_backup(
-    admin_user: Annotated[User, Depends(get_admin_user)],
+    admin_user: Annotated[Principal, Depends(get_admin_user)],
     db: Session = Depends(get_db)
 ):
     """
@@ -95,6 +97,7 @@ async def restore_from_backup(
             results["errors"].append(f"Failed to restore tool '{tool_data.get('name', 'unknown')}': {str(e)}")
     
     db.commit()
+    tool_catalog.invalidate()
     
     return {
         "success": True,
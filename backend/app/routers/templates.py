@@ -2,14 +2,20 @@
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from uuid import UUID, uuid4
+from uuid import UUID
 import json
+from datetime import datetime, timezone
 
 from ..database import get_db
 from ..models import WorkflowTemplate, User, WorkflowInstance, Execution, ExecutionStatus
 from ..schemas import WorkflowTemplatePublic, WorkflowRunRequest
-from ..routers.auth import get_current_user
+from ..routers.auth import get_current_user_record
 from ..services.n8n_client import n8n_client
+from ..services.workflow_pool import (
+    workflow_pool, workflow_pool_key, find_webhook_trigger, is_webhook_only, credential_fingerprint
+)
+from ..services.template_renderer import get_compiled_template
+from ..services.credit_ledger import deduct_credits_for_execution, record_transaction
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
@@ -42,12 +48,12 @@ async def get_template_details(template_id: UUID, db: Session = Depends(get_db))
 async def run_template(
     template_id: UUID, 
     request: WorkflowRunRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_record),
     db: Session = Depends(get_db)
 ):
     """
     Execute a template for a user.
-    Deducts credits and performs placeholder replacement.
+    Performs placeholder replacement and deducts credits for each run started.
     """
     template = db.query(WorkflowTemplate).filter(
         WorkflowTemplate.id == template_id,
@@ -57,150 +63,120 @@ async def run_template(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found or not active")
     
-    # 1. Credit Check
-    if not template.is_free:
-        if current_user.credits_balance < template.credits_per_run:
-            raise HTTPException(status_code=402, detail="Insufficient credits")
-        
-        # Deduct credits
-        current_user.credits_balance -= template.credits_per_run
-        db.commit()
+    # 1. Credit Check (credits are deducted once a run is actually started)
+    cost = template.credits_per_run if not template.is_free else 0
+    if cost and current_user.credits_balance < cost:
+        raise HTTPException(status_code=402, detail="Insufficient credits")
 
-    # 2. Placeholder Replacement
-    workflow_str = template.workflow_json
-    if template.input_schema:
-        try:
-            schema = json.loads(template.input_schema)
-            for field in schema:
-                placeholder = field.get('placeholder')
-                label = field.get('label')
-                field_type = field.get('type')
-                
-                # Find matching value in request.inputs by the label
-                val = request.inputs.get(label)
-                
-                if placeholder and val:
-                    # Logic for Credential Creation
-                    if field_type == 'credential':
-                        cred_type = label 
-                        cred_data_key = "apiKey"
-                        if "telegram" in cred_type.lower():
-                            cred_data_key = "accessToken"
-                        
-                        print(f"User Run: Creating credential for {cred_type}...")
-                        cred = await n8n_client.create_credential(
-                            name=f"USER_CRED_{current_user.email}_{uuid4().hex[:4]}",
-                            credential_type=cred_type,
-                            data={cred_data_key: val}
-                        )
-                        val = cred.get('id')
-                        print(f"Credential created with ID: {val}")
+    # 2. Placeholder Replacement (template is compiled once and cached)
+    compiled = None
+    values = {}
+    credential_labels = set()
+    credential_fingerprints = []
+    try:
+        compiled = get_compiled_template(template)
+        for field in compiled.fields:
+            placeholder = field.get('placeholder')
+            label = field.get('label')
+            field_type = field.get('type')
+            
+            # Find matching value in request.inputs by the label
+            val = request.inputs.get(label)
+            
+            if val:
+                # Logic for Credential Creation
+                if field_type == 'credential':
+                    cred_type = label 
+                    credential_labels.add(label)
+                    cred_data_key = "apiKey"
+                    if "telegram" in cred_type.lower():
+                        cred_data_key = "accessToken"
+                    
+                    # Reuse the n8n credential when this user has entered the same secret before
+                    credential_fingerprints.append(credential_fingerprint(cred_type, val))
+                    val = await workflow_pool.get_credential(db, current_user, cred_type, cred_data_key, val)
 
-                    # Global replacement in the JSON string
-                    workflow_str = workflow_str.replace(placeholder, str(val))
-        except Exception as e:
-            print(f"Error during placeholder replacement: {e}")
+                values[placeholder] = val
+    except Exception as e:
+        print(f"Error during placeholder replacement: {e}")
+
+    if compiled is None:
+        raise HTTPException(status_code=500, detail="Template workflow could not be parsed")
 
-    # 3. Create and Execute temporary workflow
+    # 3. Run on a pooled workflow when possible
     new_execution = None
     try:
-        workflow_json = json.loads(workflow_str)
-        workflow_json['name'] = f"USER_RUN: {template.name} ({current_user.email})"
-        
-        created_workflow = await n8n_client.create_workflow(workflow_json)
-        n8n_id = created_workflow.get('id')
-        
-        # --- PERSISTENCE START ---
-        # A. Create WorkflowInstance
-        workflow_instance = WorkflowInstance(
-            user_id=current_user.id,
-            template_id=str(template.id),
-            is_active=True,
-            n8n_workflow_id=n8n_id
-        )
-        db.add(workflow_instance)
-        db.commit()
-        db.refresh(workflow_instance)
+        workflow_json = compiled.render_json(values)
 
-        # B. Create Execution Record (RUNNING)
-        from ..models import Execution, ExecutionStatus
-        from datetime import datetime, timezone
+        # --- PERSISTENCE START ---
+        # A. Only webhook-only workflows whose nodes reference nothing but credentials are
+        # pooled (keyed on template and credentials); their inputs go in the webhook data.
+        # Anything else (scheduled or polling triggers, inputs rendered into nodes) gets
+        # its own workflow. New workflows are activated first; activation failure raises
+        input_placeholders = {f.get('placeholder') for f in compiled.fields if f.get('type') != 'credential'}
+        pooled = is_webhook_only(workflow_json) and not input_placeholders.intersection(compiled.slots)
+        key = workflow_pool_key(template, credential_fingerprints) if pooled else None
+        workflow_instance, _ = await workflow_pool.acquire(db, template, current_user, workflow_json, key)
+        webhook = find_webhook_trigger(workflow_json)
 
-        new_execution = Execution(
+        # B. Create Execution Record (RUNNING) and charge for it in the same commit
+        # (the ledger locks the user row and writes the credit transaction)
+        execution = Execution(
             workflow_instance_id=workflow_instance.id,
             user_id=current_user.id,
             status=ExecutionStatus.RUNNING,
-            credits_used=template.credits_per_run if not template.is_free else 0
+            credits_used=cost
         )
-        db.add(new_execution)
-        db.commit()
-        db.refresh(new_execution)
+        db.add(execution)
+        db.flush()
+        if cost:
+            try:
+                deduct_credits_for_execution(current_user.id, cost, execution.id, db)
+            except HTTPException:
+                db.rollback()
+                raise
+        else:
+            db.commit()
+        db.refresh(execution)
+        new_execution = execution
         # --- PERSISTENCE END ---
 
-        # Activate the workflow so triggers (Schedule, Webhook) work
-        print(f"Activating workflow {n8n_id}...")
-        await n8n_client.activate_workflow(n8n_id)
+        # Webhook-triggered workflows are started with the user inputs as execution data
+        if webhook:
+            method, path = webhook
+            run_data = {k: v for k, v in request.inputs.items() if k not in credential_labels}
+            await n8n_client.trigger_webhook(path, run_data, method)
 
-        # For scheduled workflows, n8n will execute automatically
-        # We need to poll for the execution ID
-        import asyncio
-        n8n_execution_id = None
-        
-        # Wait a bit for n8n to start the execution
-        print(f"Waiting for n8n to start execution...")
-        await asyncio.sleep(3)  # Initial wait
-        
-        # Poll for up to 60 seconds to find the execution
-        for attempt in range(60):
-            try:
-                print(f"Polling attempt {attempt + 1}/60...")
-                executions = await n8n_client.list_executions(workflow_id=n8n_id)
-                print(f"API response: {executions}")
-                
-                if executions.get("data") and len(executions["data"]) > 0:
-                    # Get the most recent execution
-                    latest_exec = executions["data"][0]
-                    n8n_execution_id = str(latest_exec.get("id"))
-                    print(f"✅ Found n8n execution: {n8n_execution_id}")
-                    break
-                else:
-                    print(f"No executions found yet, waiting...")
-            except Exception as e:
-                print(f"Polling error: {e}")
-            
-            await asyncio.sleep(1)
-        
-        # Store the n8n execution ID
-        if n8n_execution_id:
-            new_execution.n8n_execution_id = n8n_execution_id
-            print(f"Stored execution ID: {n8n_execution_id}")
-        else:
-            print(f"⚠️ WARNING: Could not find n8n execution ID after 60 seconds")
-        
-        # --- UPDATE EXECUTION START ---
-        new_execution.status = ExecutionStatus.SUCCESS
-        new_execution.ended_at = datetime.now(timezone.utc)
-        db.commit()
-        # --- UPDATE EXECUTION END ---
-        
-        
+        # n8n runs the workflow on its own trigger. The execution watcher attaches the
+        # n8n execution and its final status to this record as soon as n8n reports it;
+        # clients follow progress via GET /executions/{id}/status.
         return {
             "success": True,
             "execution_id": str(new_execution.id),
-            "n8n_execution_id": n8n_execution_id
+            "n8n_execution_id": None,
+            "status": new_execution.status
         }
     except Exception as e:
         # --- ERROR HANDLING START ---
+        if isinstance(e, HTTPException) and e.status_code == 402:
+            # Balance changed since the check above; nothing was charged or started
+            raise
         import traceback
         error_trace = traceback.format_exc()
         print(f"❌ EXECUTION FAILED: {str(e)}")
         print(f"🔍 TRACEBACK:\n{error_trace}")
         
         if new_execution:
+            # The run never started: refund it through the ledger
+            refund = new_execution.credits_used or 0
             new_execution.status = ExecutionStatus.FAILED
             new_execution.error_message = str(e)
             new_execution.ended_at = datetime.now(timezone.utc)
-            db.commit()
+            new_execution.credits_used = 0
+            if refund:
+                record_transaction(current_user.id, refund, "Refund: workflow run did not start", str(new_execution.id), db)
+            else:
+                db.commit()
         # --- ERROR HANDLING END ---
 
         # Re-raise as HTTP exception so frontend sees it as failure
@@ -1,5 +1,6 @@
 # backend/app/routers/tools.py
 from fastapi import APIRouter, Depends, HTTPException, Request, File, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
@@ -7,8 +8,12 @@ from pydantic import BaseModel
 from uuid import UUID
 from ..database import get_db
 from ..models import FreeTool
-from ..services.tool_executor import execute_tool
-import random
+from ..services.tool_pool import tool_pool
+from ..services.tool_executor import encode_bytes
+from ..services.usage_counter import usage_counter
+from ..services.tool_catalog import tool_catalog, CachedJSON
+from ..services.tool_uploads import get_upload_limits, parse_tool_form, discard_uploads
+import uuid
 
 router = APIRouter(prefix="/tools", tags=["tools"])
 
@@ -46,6 +51,74 @@ class ToolExecuteRequest(BaseModel):
     from_format: Optional[str] = None
     markdown_text: Optional[str] = None
 
+def _collect_files(obj, files=None):
+    """
+    Find binary payloads in a raw tool result.
+    Tools return either bare bytes or a dict like {"output": bytes, "filename": ..., "mime_type": ...}.
+    """
+    if files is None:
+        files = []
+    if isinstance(obj, (bytes, bytearray)):
+        files.append((bytes(obj), None, None))
+    elif isinstance(obj, dict):
+        data = next((obj[k] for k in ('output', 'file', 'data') if isinstance(obj.get(k), (bytes, bytearray))), None)
+        if data is not None:
+            files.append((bytes(data), obj.get('filename'), obj.get('mime_type')))
+        else:
+            for value in obj.values():
+                _collect_files(value, files)
+    elif isinstance(obj, list):
+        for value in obj:
+            _collect_files(value, files)
+    return files
+
+def _content_disposition(filename: Optional[str]) -> str:
+    safe_name = (filename or "output.bin").replace('"', '').replace('\r', '').replace('\n', '')
+    return f'attachment; filename="{safe_name}"'
+
+# Size of the pieces a binary result is written to the socket in
+BINARY_CHUNK_SIZE = 64 * 1024
+
+async def _iter_chunks(pieces):
+    # Async so Starlette sends chunks straight from the event loop (a sync
+    # iterator would cost a threadpool hop per chunk)
+    for piece in pieces:
+        view = memoryview(piece)
+        for start in range(0, len(view), BINARY_CHUNK_SIZE):
+            yield bytes(view[start:start + BINARY_CHUNK_SIZE])
+
+def _binary_response(files, multipart: bool) -> StreamingResponse:
+    """
+    Stream the tool's files as they are, in chunks, instead of building one
+    concatenated copy of every file for the response body.
+    """
+    if len(files) == 1 and not multipart:
+        data, filename, mime_type = files[0]
+        return StreamingResponse(
+            _iter_chunks([data]),
+            media_type=mime_type or "application/octet-stream",
+            headers={
+                "Content-Disposition": _content_disposition(filename),
+                "Content-Length": str(len(data)),
+            }
+        )
+
+    boundary = uuid.uuid4().hex
+    pieces = []
+    for data, filename, mime_type in files:
+        headers = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {mime_type or 'application/octet-stream'}\r\n"
+            f"Content-Disposition: {_content_disposition(filename)}\r\n\r\n"
+        )
+        pieces.extend([headers.encode('utf-8'), data, b"\r\n"])
+    pieces.append(f"--{boundary}--\r\n".encode('utf-8'))
+    return StreamingResponse(
+        _iter_chunks(pieces),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers={"Content-Length": str(sum(len(piece) for piece in pieces))}
+    )
+
 @router.post("/debug-auth")
 def debug_auth(request: Request):
     """Temporary debug endpoint"""
@@ -55,45 +128,40 @@ def debug_auth(request: Request):
         "headers": dict(request.headers)
     }
 
+def _catalog_response(request: Request, cached: CachedJSON) -> Response:
+    """Serve a pre-serialized catalog body, or 304 when the client already has it."""
+    headers = {"ETag": cached.etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == cached.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
 @router.get("/", response_model=List[ToolResponse])
-def list_all_tools(db: Session = Depends(get_db)):
+def list_all_tools(request: Request, db: Session = Depends(get_db)):
     """Get all active tools"""
-    tools = db.query(FreeTool).filter(FreeTool.is_active == True).all()
-    return tools
+    return _catalog_response(request, tool_catalog.list_all(db))
 
 @router.get("/random", response_model=List[ToolResponse])
 def get_random_tools(limit: int = 12, db: Session = Depends(get_db)):
     """Get random tools for homepage"""
-    tools = db.query(FreeTool).filter(FreeTool.is_active == True).all()
-    random_tools = random.sample(tools, min(limit, len(tools)))
-    return random_tools
+    return tool_catalog.sample(db, limit)
 
 @router.get("/categories")
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, db: Session = Depends(get_db)):
     """Get all categories with tool counts"""
-    categories = db.query(
-        FreeTool.category,
-        func.count(FreeTool.id).label('count')
-    ).filter(FreeTool.is_active == True).group_by(FreeTool.category).all()
-    
-    return [{"name": cat, "count": count} for cat, count in categories]
+    return _catalog_response(request, tool_catalog.categories(db))
 
 @router.get("/category/{category}", response_model=List[ToolResponse])
-def get_tools_by_category(category: str, db: Session = Depends(get_db)):
+def get_tools_by_category(category: str, request: Request, db: Session = Depends(get_db)):
     """Get tools by category"""
-    tools = db.query(FreeTool).filter(
-        FreeTool.category == category,
-        FreeTool.is_active == True
-    ).all()
-    return tools
+    return _catalog_response(request, tool_catalog.list_category(db, category))
 
 @router.get("/{slug}")
-def get_tool_by_slug(slug: str, db: Session = Depends(get_db)):
+def get_tool_by_slug(slug: str, request: Request, db: Session = Depends(get_db)):
     """Get single tool by slug"""
-    tool = db.query(FreeTool).filter(FreeTool.slug == slug).first()
-    if not tool:
+    cached = tool_catalog.detail(db, slug)
+    if not cached:
         raise HTTPException(status_code=404, detail="Tool not found")
-    return tool
+    return _catalog_response(request, cached)
 
 @router.post("/{slug}/execute")
 async def execute_tool_endpoint(
@@ -113,11 +181,10 @@ async def execute_tool_endpoint(
         kwargs = {}
     
     # Execute tool
-    result = execute_tool(tool.python_code, **kwargs)
+    result = await tool_pool.submit(tool.python_code, tool.id, kwargs, timeout=tool.timeout_seconds)
     
-    # Increment usage count
-    tool.usage_count += 1
-    db.commit()
+    # Increment usage count (buffered, flushed to the database in bulk)
+    usage_counter.increment(tool.id)
     
     return result
 
@@ -125,35 +192,37 @@ async def execute_tool_endpoint(
 async def execute_tool_file_endpoint(
     slug: str,
     request: Request,
+    response_format: str = "json",
     db: Session = Depends(get_db)
 ):
-    """Execute a tool with multi-part form data (files and fields)"""
+    """
+    Execute a tool with multi-part form data (files and fields).
+    response_format=binary (or Accept: application/octet-stream) returns file outputs as raw bytes,
+    response_format=multipart (or Accept: multipart/mixed) returns them as multipart parts.
+    The default JSON response keeps files base64-encoded for older clients.
+    """
     tool = db.query(FreeTool).filter(FreeTool.slug == slug).first()
     if not tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     
-    # Parse form data
-    form = await request.form()
+    # Stream the form: small uploads stay in memory, large ones are spooled to temp files
+    request_limit, field_limits = get_upload_limits(tool.input_schema)
+    form = await parse_tool_form(request, request_limit, field_limits)
     kwargs = {}
     
     import logging
     logger = logging.getLogger("uvicorn")
     
-    for key, value in form.items():
-        # Using hasattr(value, "filename") is more robust than isinstance check
-        if hasattr(value, "filename") and hasattr(value, "read"):
-            try:
-                content = await value.read()
-                kwargs[key] = content
-                kwargs[f"{key}_filename"] = value.filename
-                logger.debug(f"Processed file field '{key}': {value.filename}")
-                
-                # Map the primary 'file' to 'input_file' for tool_executor compatibility
-                if key == 'file':
-                    kwargs['input_file'] = content
-                    kwargs['filename'] = value.filename
-            except Exception as e:
-                logger.error(f"Error reading file field '{key}': {e}")
+    for key, value, filename in form:
+        if filename is not None:
+            kwargs[key] = value
+            kwargs[f"{key}_filename"] = filename
+            logger.debug(f"Processed file field '{key}': {filename}")
+            
+            # Map the primary 'file' to 'input_file' for tool_executor compatibility
+            if key == 'file':
+                kwargs['input_file'] = value
+                kwargs['filename'] = filename
         else:
             # Handle string fields (like 'opacity', 'width', etc)
             # FormData sends everything as strings. We must attempt to parse numbers.
@@ -172,10 +241,23 @@ async def execute_tool_file_endpoint(
 
     # Execute tool
     # logger.info(f"Executing tool '{slug}' with kwargs types: {[ (k, type(v).__name__) for k, v in kwargs.items() ]}")
-    result = execute_tool(tool.python_code, **kwargs)
+    accept = request.headers.get("accept", "")
+    multipart = response_format == "multipart" or "multipart/mixed" in accept
+    binary = multipart or response_format == "binary" or "application/octet-stream" in accept
+
+    try:
+        result = await tool_pool.submit(tool.python_code, tool.id, kwargs, timeout=tool.timeout_seconds, raw_bytes=binary)
+    finally:
+        discard_uploads(value for _, value, _ in form)
     
-    # Increment usage count
-    tool.usage_count += 1
-    db.commit()
+    # Increment usage count (buffered, flushed to the database in bulk)
+    usage_counter.increment(tool.id)
     
+    if binary:
+        files = _collect_files(result) if result.get("success") else []
+        if files:
+            return _binary_response(files, multipart)
+        # Nothing binary to send (or the tool failed): fall back to JSON
+        return encode_bytes(result)
+
     return result
@@ -5,8 +5,10 @@ from typing import Dict, Any, Optional
 from uuid import UUID, uuid4
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from ..models import WorkflowTemplate, User
+from ..models import WorkflowTemplate
+from .principal_cache import Principal
 from .n8n_client import n8n_client
+from .template_renderer import compile_template, get_compiled_template, store_compiled_template
 
 class AdminService:
     """Service for admin workflow template management"""
@@ -14,7 +16,7 @@ class AdminService:
     async def create_template_from_json(
         self, 
         db: Session, 
-        admin_user: User,
+        admin_user: Principal,
         workflow_json: str,
         name: str,
         description: Optional[str] = None,
@@ -28,9 +30,9 @@ class AdminService:
         The workflow is NOT yet created in n8n at this stage.
         Admin will configure it first, then test it.
         """
-        # Validate JSON
+        # Validate JSON and locate the placeholders once
         try:
-            json_data = json.loads(workflow_json)
+            compiled = compile_template(workflow_json, input_schema)
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid JSON format")
         
@@ -50,6 +52,7 @@ class AdminService:
         db.add(template)
         db.commit()
         db.refresh(template)
+        store_compiled_template(template, compiled)
         
         return template
     
@@ -91,6 +94,7 @@ class AdminService:
         
         db.commit()
         db.refresh(template)
+        get_compiled_template(template)
         
         return template
     
@@ -108,53 +112,51 @@ class AdminService:
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
-        # 1. Load the original workflow JSON string
-        workflow_str = template.workflow_json
+        # 1. Load the compiled template (parsed once, cached)
+        compiled = get_compiled_template(template)
         
-        # 2. Perform global string replacement for configured placeholders
-        if template.input_schema:
-            try:
-                schema = json.loads(template.input_schema)
-                for field in schema:
-                    placeholder = field.get('placeholder')
-                    label = field.get('label')
-                    field_type = field.get('type')
-                    
-                    # Find matching value in test_data by the label
-                    val = test_data.get(label)
-                    
-                    if placeholder and val:
-                        # Logic for Credential Creation
-                        if field_type == 'credential':
-                            # We assume the credential type is the label or we'd need another field
-                            # For simplicity now, let's assume the admin knows the n8n credential type
-                            # e.g. "telegramApi", "deepSeekApi"
-                            # We also need to know the 'key' n8n expects (usually 'apiKey' or 'accessToken')
-                            
-                            cred_type = label # Admin should set label to n8n cred type or we add a field
-                            # Common mappings
-                            cred_data_key = "apiKey"
-                            if "telegram" in cred_type.lower():
-                                cred_data_key = "accessToken"
-                            
-                            print(f"Creating credential for {cred_type}...")
-                            cred = await n8n_client.create_credential(
-                                name=f"TEMP_CRED_{template.name}_{uuid4().hex[:4]}",
-                                credential_type=cred_type,
-                                data={cred_data_key: val}
-                            )
-                            val = cred.get('id')
-                            print(f"Credential created with ID: {val}")
+        # 2. Collect placeholder values; they are applied in a single pass below
+        values = {}
+        try:
+            for field in compiled.fields:
+                placeholder = field.get('placeholder')
+                label = field.get('label')
+                field_type = field.get('type')
+                
+                # Find matching value in test_data by the label
+                val = test_data.get(label)
+                
+                if val:
+                    # Logic for Credential Creation
+                    if field_type == 'credential':
+                        # We assume the credential type is the label or we'd need another field
+                        # For simplicity now, let's assume the admin knows the n8n credential type
+                        # e.g. "telegramApi", "deepSeekApi"
+                        # We also need to know the 'key' n8n expects (usually 'apiKey' or 'accessToken')
+                        
+                        cred_type = label # Admin should set label to n8n cred type or we add a field
+                        # Common mappings
+                        cred_data_key = "apiKey"
+                        if "telegram" in cred_type.lower():
+                            cred_data_key = "accessToken"
+                        
+                        print(f"Creating credential for {cred_type}...")
+                        cred = await n8n_client.create_credential(
+                            name=f"TEMP_CRED_{template.name}_{uuid4().hex[:4]}",
+                            credential_type=cred_type,
+                            data={cred_data_key: val}
+                        )
+                        val = cred.get('id')
+                        print(f"Credential created with ID: {val}")
 
-                        # Global replacement in the JSON string
-                        workflow_str = workflow_str.replace(placeholder, str(val))
-            except Exception as e:
-                print(f"Error during placeholder replacement: {e}")
+                    values[placeholder] = val
+        except Exception as e:
+            print(f"Error during placeholder replacement: {e}")
 
         # 3. Create a temporary test workflow in n8n
         # We always create a fresh one for testing to ensure latest config is used
         try:
-            workflow_json = json.loads(workflow_str)
+            workflow_json = compiled.render_json(values)
             # Add a prefix to distinguish in n8n UI
             workflow_json['name'] = f"TEST_RUN: {template.name}"
             
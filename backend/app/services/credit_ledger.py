@@ -1,8 +1,11 @@
 # backend/app/services/credit_ledger.py
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from ..models import User, CreditTransaction
+from .principal_cache import principal_cache
 from fastapi import HTTPException
-from uuid import UUID
+from uuid import UUID, uuid4
+from typing import List, Optional, Tuple
 
 def get_user_balance(user_id: UUID, db: Session) -> int:
     user = db.query(User).filter(User.id == user_id).first()
@@ -15,7 +18,7 @@ def record_transaction(user_id: UUID, amount: int, description: str, reference_i
     Records a transaction and updates the user's cached balance atomically.
     Amount: Positive for add, Negative for deduct.
     """
-    user = db.query(User).filter(User.id == user_id).with_for_update().first() # Lock row
+    user = db.query(User).filter(User.id == user_id).with_for_update().populate_existing().first() # Lock row
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -34,6 +37,7 @@ def record_transaction(user_id: UUID, amount: int, description: str, reference_i
     
     db.add(transaction)
     db.commit()
+    principal_cache.invalidate(user.email)
     db.refresh(user)
     return user.credits_balance
 
@@ -45,3 +49,47 @@ def deduct_credits_for_execution(user_id: UUID, cost: int, execution_id: UUID, d
         reference_id=str(execution_id),
         db=db
     )
+
+def charge_executions(user_id: UUID, charges: List[Tuple[str, int]], db: Session) -> Tuple[List[str], Optional[str]]:
+    """
+    Charge a batch of executions with one ledger entry per execution, written in a
+    single bulk insert, inside the caller's transaction (nothing is committed).
+    charges is [(execution_id, cost)] in execution order; executions are charged while
+    the balance covers them and the rest are skipped (they already ran).
+    Returns (the ids that were charged, the user's email for cache invalidation).
+    """
+    charges = [(str(execution_id), cost) for execution_id, cost in charges if cost > 0]
+    if not charges:
+        return [], None
+
+    user = db.query(User).filter(User.id == user_id).with_for_update().populate_existing().first() # Lock row
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    balance = user.credits_balance
+    charged, amounts, balances = [], [], []
+    for execution_id, cost in charges:
+        if balance >= cost:
+            balance -= cost
+            charged.append(execution_id)
+            amounts.append(-cost)
+            balances.append(balance)
+    if not charged:
+        return [], user.email
+
+    user.credits_balance = balance
+    db.execute(text("""
+        INSERT INTO credit_transactions (id, user_id, amount, description, reference_id, balance_after)
+        SELECT CAST(t.id AS uuid), CAST(:user_id AS uuid), t.amount, 'Workflow Execution', t.reference_id, t.balance_after
+        FROM unnest(CAST(:ids AS text[]), CAST(:amounts AS integer[]),
+                    CAST(:reference_ids AS text[]), CAST(:balances AS integer[]))
+             AS t(id, amount, reference_id, balance_after)
+    """), {
+        "user_id": str(user_id),
+        "ids": [str(uuid4()) for _ in charged],
+        "amounts": amounts,
+        "reference_ids": charged,
+        "balances": balances,
+    })
+    db.flush()
+    return charged, user.email
@@ -0,0 +1,296 @@
+# backend/app/services/execution_watcher.py
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+import psycopg2
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from ..database import engine, SessionLocal, SQLALCHEMY_DATABASE_URL
+from ..models import ExecutionStatus
+
+# Fallback sweep for anything the notification path missed (listener reconnecting,
+# trigger not installable); also the only path when NOTIFY is unavailable
+EXECUTION_SWEEP_SECONDS = float(os.getenv("EXECUTION_SWEEP_SECONDS", "15"))
+EXECUTION_RECONNECT_SECONDS = 5.0
+# Upper bound for one long-poll on GET /executions/{id}/status
+EXECUTION_WAIT_MAX_SECONDS = float(os.getenv("EXECUTION_WAIT_MAX_SECONDS", "30"))
+# Template runs n8n never reported within this long are given up on: the sweep marks
+# them FAILED and new n8n executions are no longer attached to them
+EXECUTION_RUN_TIMEOUT_SECONDS = float(os.getenv("EXECUTION_RUN_TIMEOUT_SECONDS", str(6 * 3600)))
+
+NOTIFY_CHANNEL = "n8n_execution"
+
+# n8n writes its executions to execution_entity in our database; this trigger
+# publishes every new execution and status change on NOTIFY_CHANNEL
+INSTALL_TRIGGER_SQL = f"""
+SELECT pg_advisory_xact_lock(hashtext('flowsaas_execution_notify'));
+
+CREATE OR REPLACE FUNCTION flowsaas_notify_execution() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+        'id', NEW.id,
+        'workflowId', NEW."workflowId",
+        'status', NEW.status,
+        'stoppedAt', NEW."stoppedAt"
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS flowsaas_execution_notify ON execution_entity;
+CREATE TRIGGER flowsaas_execution_notify
+    AFTER INSERT OR UPDATE OF status, "stoppedAt" ON execution_entity
+    FOR EACH ROW EXECUTE FUNCTION flowsaas_notify_execution();
+"""
+
+OPEN_STATUSES = (ExecutionStatus.PENDING.value, ExecutionStatus.RUNNING.value)
+
+def execution_lock_key(n8n_execution_id) -> str:
+    """
+    Advisory lock key (hashtext) for one n8n execution. Held by everything that
+    attaches or imports it, so the watcher and the sync never both record it.
+    """
+    return f"n8n_execution:{n8n_execution_id}"
+
+def map_n8n_status(status_raw: Optional[str]) -> ExecutionStatus:
+    if status_raw == 'success':
+        return ExecutionStatus.SUCCESS
+    if status_raw in ('error', 'crashed', 'canceled', 'failed'):
+        return ExecutionStatus.FAILED
+    return ExecutionStatus.RUNNING
+
+def resolve_execution(n8n_execution_id: str, n8n_workflow_id: str, status_raw: Optional[str], stopped_at=None):
+    """
+    Apply one n8n execution to our executions table: attach it to the oldest open,
+    unexpired run of that workflow that has no n8n execution yet, then copy its status.
+    Safe to call repeatedly and from several processes at once.
+    """
+    status = map_n8n_status(status_raw)
+    finished = status != ExecutionStatus.RUNNING
+    params = {
+        "n8n_id": str(n8n_execution_id),
+        "workflow_id": str(n8n_workflow_id),
+        "status": status.value,
+        "finished": finished,
+        "stopped_at": stopped_at,
+        "open": list(OPEN_STATUSES),
+        "run_timeout": EXECUTION_RUN_TIMEOUT_SECONDS,
+    }
+
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": execution_lock_key(params['n8n_id'])})
+        db.execute(text("""
+            UPDATE executions SET n8n_execution_id = :n8n_id
+            WHERE id = (
+                SELECT e.id FROM executions e
+                JOIN workflow_instances wi ON wi.id = e.workflow_instance_id
+                WHERE wi.n8n_workflow_id = :workflow_id
+                  AND e.n8n_execution_id IS NULL
+                  AND e.status = ANY(:open)
+                  AND e.started_at > now() - make_interval(secs => :run_timeout)
+                ORDER BY e.started_at
+                LIMIT 1
+                FOR UPDATE OF e SKIP LOCKED
+            )
+            AND NOT EXISTS (SELECT 1 FROM executions x WHERE x.n8n_execution_id = :n8n_id)
+        """), params)
+        db.execute(text("""
+            UPDATE executions
+            SET status = :status,
+                ended_at = CASE WHEN :finished THEN COALESCE(CAST(:stopped_at AS timestamptz), now()) ELSE ended_at END
+            WHERE n8n_execution_id = :n8n_id AND status = ANY(:open)
+        """), params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def expire_open_executions(db) -> int:
+    """
+    Fail template-started runs that never got an n8n execution attached within
+    EXECUTION_RUN_TIMEOUT_SECONDS. Runs tied to an n8n execution (including
+    sync-imported ones) keep following n8n's status, however long they take.
+    """
+    expired = db.execute(text("""
+        UPDATE executions
+        SET status = :failed,
+            ended_at = now(),
+            error_message = COALESCE(error_message, 'Timed out waiting for n8n to report the execution')
+        WHERE status = ANY(:open)
+          AND n8n_execution_id IS NULL
+          AND started_at <= now() - make_interval(secs => :run_timeout)
+    """), {
+        "failed": ExecutionStatus.FAILED.value,
+        "open": list(OPEN_STATUSES),
+        "run_timeout": EXECUTION_RUN_TIMEOUT_SECONDS,
+    }).rowcount
+    db.commit()
+    if expired:
+        print(f"Execution watcher: marked {expired} stale run(s) as failed")
+    return expired
+
+def sweep_open_executions() -> Set[str]:
+    """
+    Expire stale open runs, then resolve the rest straight from execution_entity
+    in one query. Returns the n8n workflow ids that were looked at.
+    """
+    db = SessionLocal()
+    try:
+        expire_open_executions(db)
+        rows = db.execute(text("""
+            SELECT DISTINCT ee.id::text, ee."workflowId", ee.status, ee."stoppedAt"
+            FROM executions e
+            JOIN workflow_instances wi ON wi.id = e.workflow_instance_id
+            JOIN execution_entity ee ON ee."workflowId" = wi.n8n_workflow_id
+            WHERE e.status = ANY(:open)
+              AND (e.n8n_execution_id = ee.id::text
+                   OR (e.n8n_execution_id IS NULL
+                       AND e.started_at > now() - make_interval(secs => :run_timeout)
+                       AND (ee."startedAt" IS NULL OR ee."startedAt" >= e.started_at - interval '1 minute')))
+        """), {"open": list(OPEN_STATUSES), "run_timeout": EXECUTION_RUN_TIMEOUT_SECONDS}).fetchall()
+    finally:
+        db.close()
+
+    # Oldest n8n execution first, so it attaches to the oldest open run
+    for n8n_id, workflow_id, status_raw, stopped_at in sorted(rows, key=lambda r: (len(r[0]), r[0])):
+        resolve_execution(n8n_id, workflow_id, status_raw, stopped_at)
+    return {row[1] for row in rows}
+
+class ExecutionWatcher:
+    """
+    Resolves template runs as n8n reports them, instead of polling the n8n API.
+    Listens on a Postgres NOTIFY channel fed by a trigger on execution_entity and
+    wakes any request waiting on the affected workflow.
+    """
+
+    def __init__(self, sweep_interval: float = EXECUTION_SWEEP_SECONDS):
+        self.sweep_interval = sweep_interval
+        self._task = None
+        self._waiters: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait(self, n8n_workflow_id: str, timeout: float) -> bool:
+        """Wait until an execution of this n8n workflow changes. Returns False on timeout."""
+        event = asyncio.Event()
+        waiters = self._waiters[n8n_workflow_id]
+        waiters.add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters.discard(event)
+            if not waiters:
+                self._waiters.pop(n8n_workflow_id, None)
+
+    def _wake(self, n8n_workflow_ids):
+        for workflow_id in n8n_workflow_ids:
+            for event in self._waiters.get(workflow_id, ()):
+                event.set()
+
+    def _install_trigger(self) -> bool:
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT to_regclass('execution_entity') IS NOT NULL")).scalar()
+                if not exists:
+                    print("Execution watcher: execution_entity not found, using sweep only")
+                    return False
+                conn.exec_driver_sql(INSTALL_TRIGGER_SQL)
+            return True
+        except Exception as e:
+            print(f"Execution watcher: could not install trigger, using sweep only: {e}")
+            return False
+
+    def _connect(self):
+        conn = psycopg2.connect(SQLALCHEMY_DATABASE_URL)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return conn
+
+    async def _sweep(self):
+        try:
+            self._wake(await run_in_threadpool(sweep_open_executions))
+        except Exception as e:
+            print(f"Execution watcher: sweep failed: {e}")
+
+    async def _handle(self, payload: str):
+        try:
+            data = json.loads(payload)
+            await run_in_threadpool(
+                resolve_execution, data["id"], data["workflowId"], data.get("status"), data.get("stoppedAt")
+            )
+        except Exception as e:
+            print(f"Execution watcher: could not apply notification {payload!r}: {e}")
+            return
+        self._wake([str(data["workflowId"])])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        notifying = await run_in_threadpool(self._install_trigger)
+
+        while True:
+            if not notifying:
+                await self._sweep()
+                await asyncio.sleep(self.sweep_interval)
+                continue
+
+            conn = None
+            try:
+                conn = await run_in_threadpool(self._connect)
+                queue: asyncio.Queue = asyncio.Queue()
+
+                def on_readable():
+                    try:
+                        conn.poll()
+                    except Exception as e:
+                        queue.put_nowait(e)
+                        return
+                    while conn.notifies:
+                        queue.put_nowait(conn.notifies.pop(0).payload)
+
+                loop.add_reader(conn.fileno(), on_readable)
+                try:
+                    # Catch up on anything that happened while we were not listening
+                    await self._sweep()
+                    while True:
+                        try:
+                            item = await asyncio.wait_for(queue.get(), self.sweep_interval)
+                        except asyncio.TimeoutError:
+                            await self._sweep()
+                            continue
+                        if isinstance(item, Exception):
+                            raise item
+                        await self._handle(item)
+                finally:
+                    loop.remove_reader(conn.fileno())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Execution watcher: listener error, reconnecting: {e}")
+                await asyncio.sleep(EXECUTION_RECONNECT_SECONDS)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+execution_watcher = ExecutionWatcher()
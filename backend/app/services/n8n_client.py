@@ -1,7 +1,13 @@
 # backend/app/services/n8n_client.py
+import asyncio
+import heapq
 import httpx
+import importlib.util
 import os
 import json
+import threading
+import weakref
+from collections import OrderedDict
 from uuid import uuid4
 from fastapi import HTTPException
 
@@ -10,11 +16,99 @@ N8N_API_KEY = os.getenv("N8N_API_KEY", "")
 N8N_BASIC_AUTH_USER = os.getenv("N8N_USER", "admin")
 N8N_BASIC_AUTH_PASS = os.getenv("N8N_PASSWORD", "password")
 
+# Connection pool tuning for the shared HTTP client
+N8N_HTTP_MAX_CONNECTIONS = int(os.getenv("N8N_HTTP_MAX_CONNECTIONS", "50"))
+N8N_HTTP_MAX_KEEPALIVE = int(os.getenv("N8N_HTTP_MAX_KEEPALIVE", "20"))
+N8N_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("N8N_HTTP_KEEPALIVE_EXPIRY", "30"))
+N8N_HTTP_CONNECT_TIMEOUT = float(os.getenv("N8N_HTTP_CONNECT_TIMEOUT", "5"))
+N8N_HTTP_TIMEOUT = float(os.getenv("N8N_HTTP_TIMEOUT", "15"))
+# HTTP/2 is only negotiated over TLS and needs the optional h2 package
+N8N_HTTP2 = os.getenv("N8N_HTTP2", "auto").lower()
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP2_ENABLED = HTTP2_AVAILABLE and N8N_HTTP2 in ("auto", "1", "true", "yes")
+if N8N_HTTP2 in ("1", "true", "yes") and not HTTP2_AVAILABLE:
+    print("n8n client: N8N_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+
+# Entries kept by each read cache (workflow versions, finished executions, graph layouts)
+N8N_CACHE_SIZE = int(os.getenv("N8N_CACHE_SIZE", "256"))
+# Executions in these states never change again
+FINISHED_EXECUTION_STATUSES = ("success", "error", "crashed", "canceled")
+
+class _LRUCache:
+    """Small thread-safe LRU for n8n responses that are immutable under their key."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
 class N8nClient:
     def __init__(self):
         self.base_url = N8N_HOST
         self.api_key = N8N_API_KEY
         self.auth = (N8N_BASIC_AUTH_USER, N8N_BASIC_AUTH_PASS)
+        # One client per event loop: connections belong to the loop that opened them
+        self._clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self._workflow_cache = _LRUCache(N8N_CACHE_SIZE)
+        self._execution_cache = _LRUCache(N8N_CACHE_SIZE)
+        self._graph_cache = _LRUCache(N8N_CACHE_SIZE)
+
+    def start(self):
+        """Create the shared connection pool for the current event loop."""
+        self._get_client()
+
+    async def aclose(self):
+        """Close the clients (FastAPI shutdown / Celery worker exit)."""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for client_loop, client in clients:
+            if client.is_closed:
+                continue
+            if client_loop is loop:
+                await client.aclose()
+            elif client_loop.is_running():
+                # Its connections can only be closed from their own loop
+                asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Long-lived AsyncClient with keep-alive pooling for the running event loop.
+        Clients of loops that have since closed are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                for stale in [l for l in self._clients if l.is_closed()]:
+                    del self._clients[stale]
+                client = httpx.AsyncClient(
+                    http2=HTTP2_ENABLED,
+                    limits=httpx.Limits(
+                        max_connections=N8N_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=N8N_HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=N8N_HTTP_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=httpx.Timeout(N8N_HTTP_TIMEOUT, connect=N8N_HTTP_CONNECT_TIMEOUT)
+                )
+                self._clients[loop] = client
+            return client
     
     def _get_headers(self):
         headers = {}
@@ -62,40 +156,89 @@ class N8nClient:
             "settings": workflow_json.get("settings", {})
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                print(f"DEBUG: Sending to n8n: {json.dumps(payload, indent=2)}")
-                response = await client.post(
-                    f"{self.base_url}/api/v1/workflows",
-                    json=payload,
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                print(f"DEBUG: n8n response status: {response.status_code}")
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                error_detail = "Unknown error"
-                if hasattr(e, 'response') and e.response is not None:
-                     error_detail = e.response.text
-                print(f"n8n logic error: {error_detail}")
-                raise HTTPException(status_code=500, detail=f"n8n interaction failed: {str(e)} | Details: {error_detail}")
+        client = self._get_client()
+        try:
+            print(f"DEBUG: Sending to n8n: {json.dumps(payload, indent=2)}")
+            response = await client.post(
+                f"{self.base_url}/api/v1/workflows",
+                json=payload,
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            print(f"DEBUG: n8n response status: {response.status_code}")
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            error_detail = "Unknown error"
+            if hasattr(e, 'response') and e.response is not None:
+                 error_detail = e.response.text
+            print(f"n8n logic error: {error_detail}")
+            raise HTTPException(status_code=500, detail=f"n8n interaction failed: {str(e)} | Details: {error_detail}")
 
     async def activate_workflow(self, workflow_id: str):
         """
         Activates a workflow.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/workflows/{workflow_id}/activate",
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
+        client = self._get_client()
+        try:
+            response = await client.post(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}/activate",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def deactivate_workflow(self, workflow_id: str):
+        """
+        Deactivates a workflow so its triggers stop firing.
+        """
+        client = self._get_client()
+        try:
+            response = await client.post(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}/deactivate",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def delete_workflow(self, workflow_id: str):
+        """
+        Deletes a workflow. A workflow that is already gone counts as deleted.
+        """
+        client = self._get_client()
+        try:
+            response = await client.delete(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            if response.status_code == 404:
                 return True
-            except httpx.HTTPError:
-                return False
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def trigger_webhook(self, path: str, data: dict = None, method: str = "POST"):
+        """
+        Starts a run of an active workflow through its production webhook trigger.
+        """
+        client = self._get_client()
+        try:
+            if method.upper() == "GET":
+                response = await client.get(f"{self.base_url}/webhook/{path}", params=data or {})
+            else:
+                response = await client.request(method.upper(), f"{self.base_url}/webhook/{path}", json=data or {})
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to trigger workflow webhook: {str(e)}")
 
     async def create_credential(self, name: str, credential_type: str, data: dict):
         """
@@ -107,71 +250,85 @@ class N8nClient:
             "type": credential_type,
             "data": data
         }
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/credentials",
-                    json=payload,
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json() # Returns dict with "id"
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"n8n credential creation failed: {str(e)}")
+        client = self._get_client()
+        try:
+            response = await client.post(
+                f"{self.base_url}/api/v1/credentials",
+                json=payload,
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json() # Returns dict with "id"
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"n8n credential creation failed: {str(e)}")
 
     async def get_workflow(self, workflow_id: str):
         """
         Fetch a specific workflow from n8n by ID.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/workflows/{workflow_id}",
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"Failed to fetch workflow: {str(e)}")
+        client = self._get_client()
+        try:
+            response = await client.get(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch workflow: {str(e)}")
+
+    async def get_workflow_version(self, workflow_id: str, updated_at=None):
+        """
+        get_workflow, cached per (workflow_id, updatedAt).
+        Without a known updatedAt the workflow is always fetched.
+        """
+        if updated_at is None:
+            return await self.get_workflow(workflow_id)
+        key = (str(workflow_id), str(updated_at))
+        workflow = self._workflow_cache.get(key)
+        if workflow is None:
+            workflow = await self.get_workflow(workflow_id)
+            self._workflow_cache.put(key, workflow)
+        return workflow
 
     async def list_workflows(self):
         """
         List all workflows in n8n instance.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/workflows",
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"Failed to list workflows: {str(e)}")
+        client = self._get_client()
+        try:
+            response = await client.get(
+                f"{self.base_url}/api/v1/workflows",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to list workflows: {str(e)}")
     
     async def list_executions(self, workflow_id: str = None):
         """
         List executions from n8n. Optionally filter by workflow_id.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                params = {}
-                if workflow_id:
-                    params["workflowId"] = workflow_id
-                
-                response = await client.get(
-                    f"{self.base_url}/api/v1/executions",
-                    params=params,
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"Failed to list executions: {str(e)}")
+        client = self._get_client()
+        try:
+            params = {}
+            if workflow_id:
+                params["workflowId"] = workflow_id
+            
+            response = await client.get(
+                f"{self.base_url}/api/v1/executions",
+                params=params,
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to list executions: {str(e)}")
     
     async def update_workflow(self, workflow_id: str, workflow_json: dict):
         """
@@ -205,22 +362,22 @@ class N8nClient:
             "settings": workflow_json.get("settings", {})
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.put(
-                    f"{self.base_url}/api/v1/workflows/{workflow_id}",
-                    json=payload,
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                error_detail = "Unknown error"
-                if hasattr(e, 'response') and e.response is not None:
-                     error_detail = e.response.text
-                print(f"n8n update error: {error_detail}")
-                raise HTTPException(status_code=500, detail=f"n8n workflow update failed: {str(e)} | Details: {error_detail}")
+        client = self._get_client()
+        try:
+            response = await client.put(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}",
+                json=payload,
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            error_detail = "Unknown error"
+            if hasattr(e, 'response') and e.response is not None:
+                 error_detail = e.response.text
+            print(f"n8n update error: {error_detail}")
+            raise HTTPException(status_code=500, detail=f"n8n workflow update failed: {str(e)} | Details: {error_detail}")
 
 
     async def execute_workflow(self, workflow_id: str, data: dict = None):
@@ -229,90 +386,95 @@ class N8nClient:
         Uses the /run endpoint which triggers the workflow.
         Returns execution ID.
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                # n8n API uses POST on /manual-run (or webhook) endpoint to trigger execution
-                # But actually, n8n Public API for activation is different.
-                # Let's try activating via the webhook or just rely on activation.
-                
-                # Correction: The /run endpoint is for internal UI. 
-                # To execute via API, we should use the webhook if available, or just activate.
-                # However, for this "User Run" feature, we want to force a run.
-                # Official API: POST /executions - but that relies on existing workflow.
-                
-                # Let's try POST to /webhook-test if it's a test run, or the production URL. 
-                
-                # WAIT: The error is 404 on /workflows/{id}/run.
-                # n8n API docs say: POST /workflows/{id}/activate to activate.
-                # There is NO direct "execute" endpoint for arbitrary workflows in the public API 
-                # unless they have a Webhook node. 
-                
-                # BUT, since we have a Schedule Trigger, we just need to ACTIVATE it so it runs on schedule.
-                # The user clicked "Activate", so maybe we don't need to force-run immediately?
-                # The code tries to execute immediately. 
-                
-                # If we want to test-run, we should use POST /workflows/{id}/execute (internal) or similar.
-                # Let's check n8n docs or just assume that for now we only Activate.
-                
-                # Actually, the user wants "Activate Automation".
-                # If the workflow is a Schedule Trigger, manual execution might not be needed.
-                # But if we want to give immediate feedback, we need to trigger it.
-                
-                # Let's simply fix the method to POST as a first attempt, as GET /run is definitely wrong for actions.
-                # Actually, n8n public API doesn't have a simple "run this now" for all trigger types.
-                
-                # Workaround: logic should be "Activate, then return success". 
-                # We can skip the manual execution step if it's causing 404, 
-                # OR use the internal endpoint `POST /rest/workflows/{id}/run?` (but that requires cookie auth usually).
-                
-                # Safest bet: Just Activate. The frontend says "Activate Automation".
-                # I will Comment out the execution part if activation is enough, OR try POST.
-                
-                response = await client.post(
-                    f"{self.base_url}/api/v1/workflows/{workflow_id}/activate",
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                return {"id": "manual_run_skipped", "data": "Workflow Activated"}
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
+        client = self._get_client()
+        try:
+            # n8n API uses POST on /manual-run (or webhook) endpoint to trigger execution
+            # But actually, n8n Public API for activation is different.
+            # Let's try activating via the webhook or just rely on activation.
+            
+            # Correction: The /run endpoint is for internal UI. 
+            # To execute via API, we should use the webhook if available, or just activate.
+            # However, for this "User Run" feature, we want to force a run.
+            # Official API: POST /executions - but that relies on existing workflow.
+            
+            # Let's try POST to /webhook-test if it's a test run, or the production URL. 
+            
+            # WAIT: The error is 404 on /workflows/{id}/run.
+            # n8n API docs say: POST /workflows/{id}/activate to activate.
+            # There is NO direct "execute" endpoint for arbitrary workflows in the public API 
+            # unless they have a Webhook node. 
+            
+            # BUT, since we have a Schedule Trigger, we just need to ACTIVATE it so it runs on schedule.
+            # The user clicked "Activate", so maybe we don't need to force-run immediately?
+            # The code tries to execute immediately. 
+            
+            # If we want to test-run, we should use POST /workflows/{id}/execute (internal) or similar.
+            # Let's check n8n docs or just assume that for now we only Activate.
+            
+            # Actually, the user wants "Activate Automation".
+            # If the workflow is a Schedule Trigger, manual execution might not be needed.
+            # But if we want to give immediate feedback, we need to trigger it.
+            
+            # Let's simply fix the method to POST as a first attempt, as GET /run is definitely wrong for actions.
+            # Actually, n8n public API doesn't have a simple "run this now" for all trigger types.
+            
+            # Workaround: logic should be "Activate, then return success". 
+            # We can skip the manual execution step if it's causing 404, 
+            # OR use the internal endpoint `POST /rest/workflows/{id}/run?` (but that requires cookie auth usually).
+            
+            # Safest bet: Just Activate. The frontend says "Activate Automation".
+            # I will Comment out the execution part if activation is enough, OR try POST.
+            
+            response = await client.post(
+                f"{self.base_url}/api/v1/workflows/{workflow_id}/activate",
+                auth=self._get_auth(),
+                headers=self._get_headers(),
+                timeout=30.0
+            )
+            return {"id": "manual_run_skipped", "data": "Workflow Activated"}
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
 
     async def get_execution_result(self, execution_id: str):
         """
         Get execution status and results.
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/executions/{execution_id}",
-                    auth=self._get_auth(),
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                raise HTTPException(status_code=500, detail=f"Failed to get execution: {str(e)}")
+        client = self._get_client()
+        try:
+            response = await client.get(
+                f"{self.base_url}/api/v1/executions/{execution_id}",
+                auth=self._get_auth(),
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to get execution: {str(e)}")
 
-    def parse_workflow_graph(self, workflow_json: dict, execution_data: dict = None):
+    async def get_finished_execution_result(self, execution_id: str):
+        """get_execution_result, cached once the execution has finished."""
+        key = str(execution_id)
+        result = self._execution_cache.get(key)
+        if result is None:
+            result = await self.get_execution_result(execution_id)
+            if result.get("status") in FINISHED_EXECUTION_STATUSES:
+                self._execution_cache.put(key, result)
+        return result
+
+    def _workflow_layout(self, workflow_json: dict):
         """
-        Parse n8n workflow JSON into a graph structure for frontend visualization.
-        Merges execution status if provided.
-        Nodes are sorted in execution order (topological sort).
-        
-        Returns:
-        {
-            "nodes": [{"id", "name", "type", "position", "status", "execution_time", "error"}],
-            "connections": [{"from", "to"}]
-        }
+        Static part of the graph: (nodes in execution order, connections).
+        Cached per workflow version when the JSON carries id and updatedAt.
         """
-        nodes = []
+        key = None
+        if workflow_json.get("id") and workflow_json.get("updatedAt"):
+            key = (str(workflow_json["id"]), str(workflow_json["updatedAt"]))
+            layout = self._graph_cache.get(key)
+            if layout is not None:
+                return layout
+
         connections = []
         
-        # Extract execution run data if available
-        execution_run_data = {}
-        if execution_data and execution_data.get("data", {}).get("resultData", {}).get("runData"):
-            execution_run_data = execution_data["data"]["resultData"]["runData"]
-        
         # Build node map and connections
         node_map = {}
         for node in workflow_json.get("nodes", []):
@@ -342,62 +504,75 @@ class N8nClient:
                                     "to": target_node
                                 })
         
-        # Topological sort to get execution order
-        def topological_sort(node_map):
-            # Find nodes with no incoming edges (trigger nodes)
-            in_degree = {name: 0 for name in node_map}
-            for name, data in node_map.items():
-                for child in data["children"]:
-                    if child in in_degree:
-                        in_degree[child] += 1
-            
-            # Start with trigger nodes (in_degree == 0)
-            queue = [name for name, degree in in_degree.items() if degree == 0]
-            sorted_nodes = []
-            
-            while queue:
-                # Sort queue to ensure consistent ordering
-                queue.sort()
-                current = queue.pop(0)
-                sorted_nodes.append(current)
-                
-                # Reduce in-degree for children
-                for child in node_map[current]["children"]:
-                    if child in in_degree:
-                        in_degree[child] -= 1
-                        if in_degree[child] == 0:
-                            queue.append(child)
-            
-            return sorted_nodes
+        # Topological sort to get execution order (Kahn's algorithm, O((V+E) log V)).
+        # The heap always yields the alphabetically smallest ready node, so the
+        # order is deterministic; nodes on a cycle are left out.
+        in_degree = {name: 0 for name in node_map}
+        for data in node_map.values():
+            for child in data["children"]:
+                if child in in_degree:
+                    in_degree[child] += 1
+
+        # Start with trigger nodes (in_degree == 0)
+        ready = [name for name, degree in in_degree.items() if degree == 0]
+        heapq.heapify(ready)
+        ordered_nodes = []
+        while ready:
+            current = heapq.heappop(ready)
+            data = node_map[current]
+            ordered_nodes.append((data["id"], data["name"], data["type"], data["position"]))
+
+            # Reduce in-degree for children
+            for child in data["children"]:
+                if child in in_degree:
+                    in_degree[child] -= 1
+                    if in_degree[child] == 0:
+                        heapq.heappush(ready, child)
+
+        layout = (ordered_nodes, connections)
+        if key is not None:
+            self._graph_cache.put(key, layout)
+        return layout
+
+    def parse_workflow_graph(self, workflow_json: dict, execution_data: dict = None):
+        """
+        Parse n8n workflow JSON into a graph structure for frontend visualization.
+        Merges execution status if provided.
+        Nodes are sorted in execution order (topological sort).
+        
+        Returns:
+        {
+            "nodes": [{"id", "name", "type", "position", "status", "execution_time", "error"}],
+            "connections": [{"from", "to"}]
+        }
+        """
+        ordered_nodes, connections = self._workflow_layout(workflow_json)
         
-        sorted_node_names = topological_sort(node_map)
+        # Extract execution run data if available
+        execution_run_data = {}
+        if execution_data and execution_data.get("data", {}).get("resultData", {}).get("runData"):
+            execution_run_data = execution_data["data"]["resultData"]["runData"]
         
-        # Build nodes list in execution order
-        for node_name in sorted_node_names:
-            if node_name not in node_map:
-                continue
-                
-            node_data = node_map[node_name]
-            
-            # Determine status from execution data
+        # Overlay execution status on the cached layout
+        nodes = []
+        for node_id, node_name, node_type, position in ordered_nodes:
             status = "pending"
             execution_time = None
             error = None
             
-            if node_name in execution_run_data:
-                node_runs = execution_run_data[node_name]
-                if node_runs and len(node_runs) > 0:
-                    last_run = node_runs[-1]
-                    status = "error" if last_run.get("error") else "success"
-                    execution_time = last_run.get("executionTime")
-                    if last_run.get("error"):
-                        error = last_run["error"].get("message", "Unknown error")
+            node_runs = execution_run_data.get(node_name)
+            if node_runs:
+                last_run = node_runs[-1]
+                status = "error" if last_run.get("error") else "success"
+                execution_time = last_run.get("executionTime")
+                if last_run.get("error"):
+                    error = last_run["error"].get("message", "Unknown error")
             
             nodes.append({
-                "id": node_data["id"],
-                "name": node_data["name"],
-                "type": node_data["type"],
-                "position": node_data["position"],
+                "id": node_id,
+                "name": node_name,
+                "type": node_type,
+                "position": position,
                 "status": status,
                 "execution_time": execution_time,
                 "error": error
@@ -405,7 +580,7 @@ class N8nClient:
         
         return {
             "nodes": nodes,
-            "connections": connections
+            "connections": list(connections)
         }
 
 n8n_client = N8nClient()
@@ -0,0 +1,81 @@
+# backend/app/services/password_hasher.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..core.security import get_password_hash, verify_and_update_password
+
+# Threads doing bcrypt work (bcrypt releases the GIL) and how many requests may wait for one
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+class PasswordHasher:
+    """
+    Dedicated, bounded executor for password hashing and verification.
+    Keeps bcrypt off the event loop and out of the shared threadpool, so a login
+    burst queues here instead of starving other sync endpoints; requests beyond
+    the queue limit are turned away with 503.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many sign-in attempts, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+            self._peak_queued = max(self._peak_queued, self._pending - self.workers)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth metrics for GET /admin/password-hashing."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_progress": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "peak_queued": self._peak_queued,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,96 @@
+# backend/app/services/principal_cache.py
+import json
+import os
+import time
+from typing import Optional
+from uuid import UUID
+
+from .redis_lock import get_redis
+
+# How long a resolved token subject is trusted without going back to the database
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+# After a Redis error, authenticate straight from the database for this long
+PRINCIPAL_CACHE_RETRY_SECONDS = 30.0
+
+PRINCIPAL_KEY_PREFIX = "flowsaas:principal:"
+
+class Principal:
+    """
+    The authenticated user as routers see it: the few fields they read, without
+    an ORM row. Routes that modify the user depend on get_current_user_record.
+    """
+    __slots__ = ("id", "email", "is_admin", "is_active", "credits_balance")
+
+    def __init__(self, id, email: str, is_admin: bool = False, is_active: bool = True, credits_balance: int = 0):
+        self.id = id
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.is_active = True if is_active is None else bool(is_active)
+        self.credits_balance = credits_balance or 0
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.email, user.is_admin, user.is_active, user.credits_balance)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": str(self.id),
+            "email": self.email,
+            "is_admin": self.is_admin,
+            "is_active": self.is_active,
+            "credits_balance": self.credits_balance,
+        })
+
+    @classmethod
+    def from_json(cls, raw) -> "Principal":
+        data = json.loads(raw)
+        return cls(UUID(data["id"]), data["email"], data["is_admin"], data["is_active"], data["credits_balance"])
+
+class PrincipalCache:
+    """
+    Token subject -> Principal, shared by all API processes and workers through
+    Redis so an invalidation anywhere (e.g. credits charged by Celery) is seen
+    everywhere. If Redis is unreachable, lookups simply miss.
+    """
+
+    def __init__(self, ttl: int = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._retry_at = 0.0
+
+    def _redis(self):
+        if self.ttl <= 0 or time.monotonic() < self._retry_at:
+            return None
+        return get_redis()
+
+    def _failed(self, e: Exception):
+        print(f"Principal cache unavailable, using the database: {e}")
+        self._retry_at = time.monotonic() + PRINCIPAL_CACHE_RETRY_SECONDS
+
+    def get(self, subject: str) -> Optional[Principal]:
+        try:
+            client = self._redis()
+            raw = client.get(PRINCIPAL_KEY_PREFIX + subject) if client is not None else None
+        except Exception as e:
+            self._failed(e)
+            return None
+        return Principal.from_json(raw) if raw else None
+
+    def put(self, principal: Principal):
+        try:
+            client = self._redis()
+            if client is not None:
+                client.set(PRINCIPAL_KEY_PREFIX + principal.email, principal.to_json(), ex=self.ttl)
+        except Exception as e:
+            self._failed(e)
+
+    def invalidate(self, subject: str):
+        """Forget a user (by email, the token subject) after their credits or flags change."""
+        if self.ttl <= 0:
+            return
+        try:
+            # Always attempted: other processes may still be reading the entry
+            get_redis().delete(PRINCIPAL_KEY_PREFIX + subject)
+        except Exception as e:
+            self._failed(e)
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,54 @@
+# backend/app/services/redis_lock.py
+import os
+import uuid
+from typing import Optional
+
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+# Delete the key only if it still holds our token, so an expired lock that
+# someone else re-acquired is never released by the old owner
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Push the expiry out only while the key still holds our token
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_client = None
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+def acquire_lock(name: str, ttl_seconds: int) -> Optional[str]:
+    """
+    Try to take a cluster-wide lock without blocking.
+    Returns the owner token, or None if someone else holds it.
+    The TTL bounds how long a crashed owner can keep it.
+    """
+    token = uuid.uuid4().hex
+    if get_redis().set(name, token, nx=True, ex=ttl_seconds):
+        return token
+    return None
+
+def release_lock(name: str, token: str) -> bool:
+    return bool(get_redis().eval(_RELEASE_SCRIPT, 1, name, token))
+
+def extend_lock(name: str, token: str, ttl_seconds: int) -> bool:
+    """
+    Reset the lock's TTL while it is still ours; called periodically by long runs.
+    Returns False if the lock expired or was taken over.
+    """
+    return bool(get_redis().eval(_EXTEND_SCRIPT, 1, name, token, ttl_seconds))
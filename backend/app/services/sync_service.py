@@ -1,120 +1,419 @@
 
-from sqlalchemy import text, create_engine
+from sqlalchemy import text, create_engine, cast, String
 from sqlalchemy.orm import Session
 from ..database import SQLALCHEMY_DATABASE_URL
 from ..models import User, Execution, WorkflowInstance, ExecutionStatus, RateLimit, WorkflowTemplate
-from uuid import UUID
+from .credit_ledger import charge_executions
+from .principal_cache import principal_cache
+from .execution_watcher import OPEN_STATUSES, EXECUTION_RUN_TIMEOUT_SECONDS, execution_lock_key
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Tuple
+from uuid import UUID, uuid4
 import os
+import threading
+import time
 
 # Create a separate engine connection for raw SQL queries if needed, 
 # but we can reuse the session or main engine.
 # However, n8n data is in the SAME database but different table.
 # We can query 'execution_entity' directly via raw SQL in the same session.
 
-def sync_executions_for_user(user_id: UUID, db: Session):
+# n8n status -> our status, shared by the bulk insert and the running-set refresh
+N8N_STATUS_SQL = """
+    CASE {column}
+        WHEN 'success' THEN 'SUCCESS'
+        WHEN 'error' THEN 'FAILED'
+        WHEN 'crashed' THEN 'FAILED'
+        WHEN 'canceled' THEN 'FAILED'
+        ELSE 'RUNNING'
+    END
+"""
+
+# Approximate rows fetched from execution_entity per round trip (split across workflows)
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "5000"))
+
+# Global sync: full reload of the workflow index, and how long an unknown
+# n8n workflow id is remembered before it is looked up again
+SYNC_INDEX_TTL_SECONDS = float(os.getenv("SYNC_INDEX_TTL_SECONDS", "300"))
+SYNC_INDEX_NEGATIVE_TTL_SECONDS = float(os.getenv("SYNC_INDEX_NEGATIVE_TTL_SECONDS", "60"))
+# The global pass re-reads this many ids below its mark, for executions that
+# committed after a higher id was already synced (duplicates are skipped on insert)
+SYNC_GLOBAL_OVERLAP = int(os.getenv("SYNC_GLOBAL_OVERLAP", "1000"))
+# sync_watermarks row holding the global pass mark (never a real n8n workflow id)
+GLOBAL_WATERMARK_KEY = "*"
+
+# New executions for a set of workflows, each above its own watermark, at most :limit
+# per workflow. All inputs are bound arrays, so the plan is reused regardless of how
+# many workflows a user has, and each lateral lookup is an index range scan on
+#   execution_entity ("workflowId", id) INCLUDE ("startedAt", "stoppedAt", status)
+# (alembic revision 0003)
+NEW_EXECUTIONS_QUERY = text("""
+    SELECT ee.id, ee."workflowId", ee."startedAt", ee."stoppedAt", ee.status
+    FROM unnest(CAST(:workflow_ids AS varchar[]), CAST(:marks AS bigint[])) AS m(workflow_id, mark)
+    CROSS JOIN LATERAL (
+        SELECT id, "workflowId", "startedAt", "stoppedAt", status
+        FROM execution_entity
+        WHERE "workflowId" = m.workflow_id AND id > m.mark
+        ORDER BY id
+        LIMIT :limit
+    ) ee
+    ORDER BY ee.id
+""")
+
+# All new executions across every workflow, in primary key order
+GLOBAL_EXECUTIONS_QUERY = text("""
+    SELECT id, "workflowId", "startedAt", "stoppedAt", status
+    FROM execution_entity
+    WHERE id > :mark
+    ORDER BY id
+    LIMIT :limit
+""")
+
+INSTANCE_INDEX_SQL = """
+    SELECT wi.n8n_workflow_id, wi.id, wi.user_id,
+           CASE WHEN wt.is_free THEN 0 ELSE COALESCE(wt.credits_per_run, 0) END
+    FROM workflow_instances wi
+    LEFT JOIN workflow_templates wt ON wt.id::text = wi.template_id
+    WHERE wi.is_active = TRUE AND wi.n8n_workflow_id IS NOT NULL
+"""
+
+class WorkflowIndex:
+    """
+    In-memory n8n_workflow_id -> (instance_id, user_id, credit cost per run) map
+    for the global sync pass. Fully reloaded every SYNC_INDEX_TTL_SECONDS; ids
+    seen in between (e.g. freshly pooled workflows) are loaded on demand.
+    """
+
+    def __init__(self, ttl: float = SYNC_INDEX_TTL_SECONDS, negative_ttl: float = SYNC_INDEX_NEGATIVE_TTL_SECONDS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[UUID, UUID, int]] = {}
+        self._unknown: Dict[str, float] = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def lookup(self, db: Session, workflow_ids: Iterable[str]) -> Dict[str, Tuple[UUID, UUID, int]]:
+        """Entries for the given n8n workflow ids; ids without an active instance are left out."""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+                rows = db.execute(text(INSTANCE_INDEX_SQL)).fetchall()
+                self._entries = {row[0]: tuple(row[1:]) for row in rows}
+                self._unknown = {}
+                self._loaded_at = now
+
+            wanted = set(workflow_ids)
+            missing = [
+                workflow_id for workflow_id in wanted
+                if workflow_id not in self._entries
+                and now - self._unknown.get(workflow_id, -self.negative_ttl) >= self.negative_ttl
+            ]
+            if missing:
+                rows = db.execute(
+                    text(INSTANCE_INDEX_SQL + " AND wi.n8n_workflow_id = ANY(:ids)"), {"ids": missing}
+                ).fetchall()
+                for row in rows:
+                    self._entries[row[0]] = tuple(row[1:])
+                for workflow_id in missing:
+                    if workflow_id not in self._entries:
+                        self._unknown[workflow_id] = now
+
+            return {workflow_id: self._entries[workflow_id] for workflow_id in wanted if workflow_id in self._entries}
+
+workflow_index = WorkflowIndex()
+
+def sync_all_executions_global(db: Session, heartbeat: Callable[[], bool] = None) -> Dict[str, int]:
+    """
+    One pass over new execution_entity rows for all workflows at once, instead of
+    one pass per user. Cost follows the number of new executions, not of users.
+    heartbeat, if given, is called after every chunk; the pass stops early when it
+    returns False (the caller no longer owns the run).
+    Returns counts: rows (inserted or refreshed), users (with new executions), skipped.
+    """
+    stats = {"rows": 0, "users": 0, "skipped": 0}
+    users = set()
+
+    mark = db.execute(
+        text("SELECT last_execution_id FROM sync_watermarks WHERE n8n_workflow_id = :key"),
+        {"key": GLOBAL_WATERMARK_KEY}
+    ).scalar() or 0
+    cursor = max(0, mark - SYNC_GLOBAL_OVERLAP)
+
+    while True:
+        n8n_executions = db.execute(GLOBAL_EXECUTIONS_QUERY, {"mark": cursor, "limit": SYNC_CHUNK_SIZE}).fetchall()
+        if not n8n_executions:
+            break
+        cursor = int(n8n_executions[-1][0])
+
+        index = workflow_index.lookup(db, {row[1] for row in n8n_executions})
+        entries = [(row, index[row[1]]) for row in n8n_executions if row[1] in index]
+        stats["skipped"] += len(n8n_executions) - len(entries)
+
+        # The global mark goes into the same transaction as the chunk's rows;
+        # executions of workflows we don't manage are simply passed over
+        _advance_marks({GLOBAL_WATERMARK_KEY: cursor}, db)
+        _, inserted = _import_chunk(entries, db)
+        stats["rows"] += len(inserted)
+        users.update(user_id for _, user_id, _ in inserted)
+
+        if heartbeat is not None and not heartbeat():
+            print("Global execution sync: run lock lost, stopping this pass")
+            stats["users"] = len(users)
+            return stats
+
+    stats["rows"] += _refresh_running(db)
+    stats["users"] = len(users)
+    return stats
+
+def sync_executions_for_user(user_id: UUID, db: Session) -> int:
     """
     Syncs executions from n8n 'execution_entity' table to our 'executions' table.
+    Incremental: only rows above each workflow's high-water mark are read, and
+    executions we imported while still running are refreshed separately.
+    Returns the number of execution rows inserted or updated.
     """
+    synced = 0
     try:
         # 1. Get all n8n_workflow_ids for this user's active instances
         # We need to map n8n_workflow_id -> internal workflow_instance_id logic
         # Current data model: WorkflowInstance has n8n_workflow_id (String)
-        
-        user_instances = db.query(WorkflowInstance).filter(
+        # Templates are joined in for pricing; template_id is stored as a string
+        user_instances = db.query(
+            WorkflowInstance.id,
+            WorkflowInstance.n8n_workflow_id,
+            WorkflowTemplate.is_free,
+            WorkflowTemplate.credits_per_run
+        ).outerjoin(
+            WorkflowTemplate, cast(WorkflowTemplate.id, String) == WorkflowInstance.template_id
+        ).filter(
             WorkflowInstance.user_id == user_id,
             WorkflowInstance.is_active == True
         ).all()
         
         if not user_instances:
-            return
+            return synced
 
-        n8n_map = {instance.n8n_workflow_id: instance.id for instance in user_instances if instance.n8n_workflow_id}
+        # n8n_workflow_id -> (instance_id, user_id, credit cost per run)
+        n8n_map = {}
+        for instance_id, n8n_workflow_id, is_free, credits_per_run in user_instances:
+            if n8n_workflow_id:
+                n8n_map[n8n_workflow_id] = (instance_id, user_id, 0 if is_free else (credits_per_run or 0))
         n8n_ids = list(n8n_map.keys())
         
         if not n8n_ids:
-            return
+            return synced
 
-        # 2. Query n8n executions
-        # We only want finished executions or running ones?
-        # Let's get everything that isn't already synced.
-        
-        # Format tuple for SQL IN clause
-        if len(n8n_ids) == 1:
-            ids_tuple = f"('{n8n_ids[0]}')"
-        else:
-            ids_tuple = str(tuple(n8n_ids))
-            
-        # Select executions for these workflows
-        query = text(f"""
-            SELECT id, "workflowId", "startedAt", "stoppedAt", status 
-            FROM execution_entity 
-            WHERE "workflowId" IN {ids_tuple}
-        """)
-        
-        result = db.execute(query)
-        n8n_executions = result.fetchall()
-        
-        # 3. Import new executions
-        for row in n8n_executions:
-            n8n_id = str(row[0]) # ID is integer in n8n, convert to string
-            workflow_id = row[1]
-            started_at = row[2]
-            stopped_at = row[3] # Can be None
-            status_raw = row[4] # 'success', 'error', 'running'
-            
-            # Check if exists
-            exists = db.query(Execution).filter(Execution.n8n_execution_id == n8n_id).first()
-            if exists:
-                continue
-
-            # Map status
-            status = ExecutionStatus.RUNNING
-            if status_raw == 'success':
-                status = ExecutionStatus.SUCCESS
-            elif status_raw == 'error':
-                status = ExecutionStatus.FAILED
-            
-            
-            # Get the template to determine credit cost
-            workflow_instance = db.query(WorkflowInstance).filter(
-                WorkflowInstance.id == n8n_map[workflow_id]
-            ).first()
-            
-            credits_to_deduct = 0
-            if workflow_instance and workflow_instance.template_id:
-                template = db.query(WorkflowTemplate).filter(
-                    WorkflowTemplate.id == workflow_instance.template_id
-                ).first()
-                
-                if template and not template.is_free:
-                    credits_to_deduct = template.credits_per_run
-            
-            # Create Execution
-            new_execution = Execution(
-                user_id=user_id,
-                workflow_instance_id=n8n_map[workflow_id],
-                n8n_execution_id=n8n_id,
-                status=status,
-                started_at=started_at,
-                ended_at=stopped_at,
-                credits_used=credits_to_deduct
-            )
-            
-            db.add(new_execution)
-            
-            # Deduct credits if needed
-            if credits_to_deduct > 0:
-                user = db.query(User).filter(User.id == user_id).first()
-                if user and user.credits_balance >= credits_to_deduct:
-                    from .credit_ledger import deduct_credits_for_execution
-                    try:
-                        deduct_credits_for_execution(user_id, credits_to_deduct, new_execution.id, db)
-                    except Exception as credit_error:
-                        print(f"Credit deduction failed: {credit_error}")
-                        # Continue anyway - execution already happened
-        
-        db.commit()
+        # 2. Current high-water marks (0 for workflows we have never synced)
+        marks = dict(db.execute(
+            text("SELECT n8n_workflow_id, last_execution_id FROM sync_watermarks WHERE n8n_workflow_id = ANY(:ids)"),
+            {"ids": n8n_ids}
+        ).fetchall())
+
+        # 3. Only n8n executions newer than the mark of their workflow, read in
+        # keyset-paginated chunks so memory stays flat for very large histories
+        per_workflow_limit = max(100, SYNC_CHUNK_SIZE // len(n8n_ids))
+        while True:
+            n8n_executions = db.execute(NEW_EXECUTIONS_QUERY, {
+                "workflow_ids": n8n_ids,
+                "marks": [marks.get(workflow_id, 0) for workflow_id in n8n_ids],
+                "limit": per_workflow_limit
+            }).fetchall()
+            if not n8n_executions:
+                break
+            chunk_marks, inserted = _import_chunk([(row, n8n_map[row[1]]) for row in n8n_executions], db)
+            marks.update(chunk_marks)
+            synced += len(inserted)
+
+        # 4. Refresh the small set of executions that were still running when imported
+        synced += _refresh_running(db, user_id)
         
     except Exception as e:
+        db.rollback()
         print(f"Sync failed: {e}")
         # Don't block the UI request if sync fails
+
+    return synced
+
+def _refresh_running(db: Session, user_id: UUID = None) -> int:
+    """
+    Copy final n8n status onto executions imported while still running
+    (one user's, or everyone's). Returns the number of rows updated.
+    Driven by the open runs (ix_executions_open); each one is looked up in
+    execution_entity by primary key.
+    """
+    user_filter = "AND o.user_id = CAST(:user_id AS uuid)" if user_id else ""
+    refreshed = db.execute(text(f"""
+        UPDATE executions e
+        SET status = {N8N_STATUS_SQL.format(column="ee.status")},
+            ended_at = ee."stoppedAt"
+        FROM (
+            SELECT o.id,
+                   -- n8n ids are integers; anything else can't match and must not break the cast
+                   CASE WHEN o.n8n_execution_id ~ '^[0-9]{{1,18}}$'
+                        THEN CAST(o.n8n_execution_id AS bigint) END AS n8n_id
+            FROM executions o
+            WHERE o.status = 'RUNNING'
+              AND o.n8n_execution_id IS NOT NULL
+              {user_filter}
+        ) open_runs
+        JOIN execution_entity ee ON ee.id = open_runs.n8n_id
+        WHERE e.id = open_runs.id
+          AND ee.status IN ('success', 'error', 'crashed', 'canceled')
+    """), {"user_id": str(user_id) if user_id else None})
+    db.commit()
+    return refreshed.rowcount
+
+def _attach_to_open_runs(entries, db: Session):
+    """
+    Hand n8n executions to template runs still waiting for one, with the matching
+    rules of execution_watcher.resolve_execution and under the same per-execution
+    locks. A run started (and charged) by run_template is then never imported as a
+    second, charged row. Returns the entries that still need importing.
+    """
+    if not entries:
+        return entries
+
+    waiting = defaultdict(deque)
+    for run_id, instance_id, started_at in db.execute(text("""
+        SELECT id, workflow_instance_id, started_at FROM executions
+        WHERE workflow_instance_id = ANY(CAST(:instance_ids AS uuid[]))
+          AND n8n_execution_id IS NULL
+          AND status = ANY(:open)
+          AND started_at > now() - make_interval(secs => :run_timeout)
+        ORDER BY started_at
+        FOR UPDATE SKIP LOCKED
+    """), {
+        "instance_ids": list({str(instance_id) for _, (instance_id, _, _) in entries}),
+        "open": list(OPEN_STATUSES),
+        "run_timeout": EXECUTION_RUN_TIMEOUT_SECONDS,
+    }):
+        waiting[str(instance_id)].append((run_id, started_at))
+    if not waiting:
+        # Nothing to attach to. A run the watcher is attaching right now is row-locked
+        # and skipped above; its n8n execution then conflicts on the unique index and
+        # the insert leaves it to the watcher.
+        return entries
+
+    # Only executions that could be attached need the watcher's lock (in a fixed
+    # order, so two passes can't deadlock)
+    candidates = [str(row[0]) for row, target in entries if str(target[0]) in waiting]
+    db.execute(text("""
+        SELECT pg_advisory_xact_lock(hashtext(s.k))
+        FROM (SELECT k FROM unnest(CAST(:keys AS text[])) AS k ORDER BY k) s
+    """), {"keys": [execution_lock_key(n8n_id) for n8n_id in candidates]})
+
+    # Already recorded (e.g. attached by the watcher): the insert skips these anyway
+    owned = set(db.execute(
+        text("SELECT n8n_execution_id FROM executions WHERE n8n_execution_id = ANY(CAST(:ids AS varchar[]))"),
+        {"ids": candidates}
+    ).scalars())
+
+    # Oldest n8n execution goes to the oldest waiting run of its instance
+    attach = {"run_ids": [], "n8n_ids": [], "statuses": [], "ended": []}
+    remaining = []
+    for row, target in sorted(entries, key=lambda entry: int(entry[0][0])):
+        runs = waiting.get(str(target[0]))
+        n8n_started_at = row[2]
+        if (str(row[0]) not in owned and runs
+                and (n8n_started_at is None or n8n_started_at >= runs[0][1] - timedelta(minutes=1))):
+            run_id, _ = runs.popleft()
+            attach["run_ids"].append(str(run_id))
+            attach["n8n_ids"].append(str(row[0]))
+            attach["statuses"].append(row[4])
+            attach["ended"].append(row[3])
+        else:
+            remaining.append((row, target))
+
+    if attach["run_ids"]:
+        db.execute(text(f"""
+            UPDATE executions e
+            SET n8n_execution_id = v.n8n_id,
+                status = {N8N_STATUS_SQL.format(column="v.status")},
+                ended_at = v.ended_at
+            FROM unnest(
+                CAST(:run_ids AS uuid[]), CAST(:n8n_ids AS varchar[]),
+                CAST(:statuses AS varchar[]), CAST(:ended AS timestamptz[])
+            ) AS v(id, n8n_id, status, ended_at)
+            WHERE e.id = v.id
+        """), attach)
+    return remaining
+
+def _import_chunk(entries, db: Session):
+    """
+    Insert one chunk of n8n executions, advance the marks and charge credits.
+    entries is [(execution_entity row, (instance_id, user_id, credit cost))].
+    Returns (new mark of every workflow in the chunk, inserted (id, user_id, credits_used) rows).
+    """
+    new_marks = {}
+    for row, _ in entries:
+        new_marks[row[1]] = max(new_marks.get(row[1], 0), int(row[0]))
+
+    # Executions belonging to a template run that is waiting for them are attached
+    # to that run (already charged) instead of being imported
+    entries = _attach_to_open_runs(entries, db)
+
+    # Import new executions in one statement; rows that already exist (e.g. attached
+    # to a template run by the execution watcher) are skipped by the unique index
+    # on n8n_execution_id, so concurrent or repeated passes never duplicate a run
+    rows = {"ids": [], "user_ids": [], "instance_ids": [], "n8n_ids": [], "statuses": [], "started": [], "ended": [], "credits": []}
+    for row, (instance_id, user_id, cost) in entries:
+        n8n_id = str(row[0]) # ID is integer in n8n, convert to string
+
+        rows["ids"].append(str(uuid4()))
+        rows["user_ids"].append(str(user_id))
+        rows["instance_ids"].append(str(instance_id))
+        rows["n8n_ids"].append(n8n_id)
+        rows["statuses"].append(row[4])
+        rows["started"].append(row[2])
+        rows["ended"].append(row[3]) # Can be None
+        rows["credits"].append(cost)
+
+    inserted = []
+    if entries:
+        inserted = db.execute(text(f"""
+            INSERT INTO executions (id, user_id, workflow_instance_id, n8n_execution_id, status, started_at, ended_at, credits_used)
+            SELECT v.id, v.user_id, v.instance_id, v.n8n_id, {N8N_STATUS_SQL.format(column="v.status")},
+                   COALESCE(v.started_at, v.ended_at, now()), v.ended_at, v.credits
+            FROM unnest(
+                CAST(:ids AS uuid[]), CAST(:user_ids AS uuid[]), CAST(:instance_ids AS uuid[]), CAST(:n8n_ids AS varchar[]),
+                CAST(:statuses AS varchar[]), CAST(:started AS timestamptz[]), CAST(:ended AS timestamptz[]),
+                CAST(:credits AS integer[])
+            ) AS v(id, user_id, instance_id, n8n_id, status, started_at, ended_at, credits)
+            ON CONFLICT (n8n_execution_id) WHERE n8n_execution_id IS NOT NULL DO NOTHING
+            RETURNING id, user_id, credits_used
+        """), rows).fetchall()
+
+    # Advance the marks and charge the imported executions in the same transaction:
+    # a failure rolls all of it back and the next pass retries the chunk, so no run
+    # is ever left behind the watermark uncharged
+    _advance_marks(new_marks, db)
+    charges = defaultdict(list)
+    for execution_id, user_id, credits_used in inserted:
+        charges[user_id].append((execution_id, credits_used))
+    emails = []
+    for user_id in sorted(charges, key=str):  # Row locks in a fixed order
+        charged, email = charge_executions(user_id, charges[user_id], db)
+        if charged:
+            emails.append(email)
+    db.commit()
+    for email in emails:
+        principal_cache.invalidate(email)
+
+    return new_marks, inserted
+
+def _advance_marks(new_marks: Dict[str, int], db: Session):
+    if not new_marks:
+        return
+    db.execute(text("""
+        INSERT INTO sync_watermarks (n8n_workflow_id, last_execution_id, updated_at)
+        SELECT m.workflow_id, m.mark, now()
+        FROM unnest(CAST(:workflow_ids AS varchar[]), CAST(:marks AS bigint[])) AS m(workflow_id, mark)
+        ON CONFLICT (n8n_workflow_id) DO UPDATE
+        SET last_execution_id = GREATEST(sync_watermarks.last_execution_id, EXCLUDED.last_execution_id),
+            updated_at = now()
+    """), {"workflow_ids": list(new_marks.keys()), "marks": list(new_marks.values())})
@@ -0,0 +1,116 @@
+# backend/app/services/template_renderer.py
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+
+# Number of compiled workflow templates kept in memory
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "128"))
+
+_template_cache: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+class CompiledTemplate:
+    """
+    A workflow template split around its placeholders.
+    The workflow JSON is parsed once; every placeholder occurrence inside a string
+    value becomes a slot, and the serialized JSON is kept as the literal text between
+    slots. Rendering joins the fragments with JSON-escaped values in one pass, so the
+    output is always valid JSON and keys are never touched.
+    """
+    __slots__ = ("fields", "fragments", "slots")
+
+    def __init__(self, fields: List[dict], fragments: List[str], slots: List[str]):
+        self.fields = fields        # input_schema entries that have a placeholder
+        self.fragments = fragments  # len(slots) + 1 literal JSON pieces
+        self.slots = slots          # placeholder for each gap between fragments
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """
+        JSON text with placeholders replaced by str(value).
+        Placeholders without a (truthy) value are left as they are.
+        """
+        parts = [self.fragments[0]]
+        for placeholder, fragment in zip(self.slots, self.fragments[1:]):
+            value = values.get(placeholder)
+            text = str(value) if value else placeholder
+            parts.append(json.dumps(text)[1:-1])
+            parts.append(fragment)
+        return "".join(parts)
+
+    def render_json(self, values: Dict[str, Any]) -> Union[dict, list]:
+        return json.loads(self.render(values))
+
+def _parse_fields(input_schema: Optional[str]) -> List[dict]:
+    if not input_schema:
+        return []
+    try:
+        schema = json.loads(input_schema)
+    except (TypeError, ValueError) as e:
+        print(f"Invalid template input schema, no placeholders applied: {e}")
+        return []
+    if not isinstance(schema, list):
+        return []
+    return [f for f in schema if isinstance(f, dict) and f.get('placeholder')]
+
+def compile_template(workflow_json: str, input_schema: Optional[str]) -> CompiledTemplate:
+    """Parse a template and locate every placeholder occurrence in its string values."""
+    fields = _parse_fields(input_schema)
+    workflow = json.loads(workflow_json)
+
+    placeholders = sorted({f['placeholder'] for f in fields}, key=len, reverse=True)
+    if not placeholders:
+        return CompiledTemplate(fields, [json.dumps(workflow)], [])
+
+    # Mark each occurrence with a sentinel that cannot appear in the template, then
+    # split the serialized JSON on the (escaped) sentinels
+    nonce = uuid.uuid4().hex
+    pattern = re.compile("|".join(re.escape(p) for p in placeholders))
+    index = {p: i for i, p in enumerate(placeholders)}
+
+    def mark(match):
+        return f"\x00{nonce}:{index[match.group(0)]}\x00"
+
+    def walk(node):
+        if isinstance(node, dict):
+            return {key: walk(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [walk(value) for value in node]
+        if isinstance(node, str):
+            return pattern.sub(mark, node)
+        return node
+
+    text = json.dumps(walk(workflow))
+    pieces = re.split(r"\\u0000" + nonce + r":(\d+)\\u0000", text)
+    fragments = pieces[0::2]
+    slots = [placeholders[int(i)] for i in pieces[1::2]]
+    return CompiledTemplate(fields, fragments, slots)
+
+def _cache_key(template) -> str:
+    # Every ORM update bumps updated_at, so (id, updated_at) identifies the content
+    # without hashing the workflow JSON on each run
+    updated_at = template.updated_at.isoformat() if template.updated_at else ""
+    return f"{template.id}:{updated_at}"
+
+def store_compiled_template(template, compiled: CompiledTemplate):
+    """Cache an already compiled template (e.g. the one built while validating an upload)."""
+    with _template_cache_lock:
+        _template_cache[_cache_key(template)] = compiled
+        while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+
+def get_compiled_template(template) -> CompiledTemplate:
+    """Compiled form of a WorkflowTemplate, cached by template id and updated_at."""
+    key = _cache_key(template)
+    with _template_cache_lock:
+        compiled = _template_cache.get(key)
+        if compiled is not None:
+            _template_cache.move_to_end(key)
+            return compiled
+
+    compiled = compile_template(template.workflow_json, template.input_schema)
+    store_compiled_template(template, compiled)
+    return compiled
@@ -0,0 +1,117 @@
+# backend/app/services/tool_catalog.py
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from ..models import FreeTool
+
+# Safety net for changes made by other processes; local admin mutations invalidate immediately
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+# Columns the public listings need (matches ToolResponse) - no python_code / content_json
+LIST_COLUMNS = (
+    FreeTool.id, FreeTool.name, FreeTool.slug, FreeTool.description, FreeTool.category,
+    FreeTool.icon, FreeTool.input_type, FreeTool.output_type, FreeTool.usage_count,
+    FreeTool.seo_title, FreeTool.seo_description, FreeTool.seo_keywords, FreeTool.input_schema,
+)
+
+# Everything except the tool source, which is never served publicly
+DETAIL_COLUMNS = tuple(c for c in FreeTool.__table__.columns if c.name != "python_code")
+
+class CachedJSON:
+    """A pre-serialized JSON body and its ETag."""
+    __slots__ = ("body", "etag")
+
+    def __init__(self, data):
+        self.body = json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+class _Snapshot:
+    def __init__(self, tools):
+        self.tools = tools
+        self.all = CachedJSON(tools)
+
+        by_category = defaultdict(list)
+        for tool in tools:
+            by_category[tool["category"]].append(tool)
+        self.by_category = {cat: CachedJSON(items) for cat, items in by_category.items()}
+        self.categories = CachedJSON([{"name": cat, "count": len(items)} for cat, items in by_category.items()])
+        self.built_at = time.monotonic()
+
+class ToolCatalog:
+    """
+    In-process cache of the public free-tool catalog.
+    The active-tool listing is loaded once (light columns only) and served as
+    precomputed JSON; detail rows are fetched lazily per slug.
+    """
+
+    def __init__(self, ttl: float = CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._details: Dict[str, CachedJSON] = {}
+
+    def invalidate(self):
+        """Drop everything; the next request rebuilds from the database."""
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+            self._details = {}
+
+    def _current(self, db: Session) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= self.ttl:
+                rows = db.query(*LIST_COLUMNS).filter(FreeTool.is_active == True).all()
+                snapshot = _Snapshot([dict(row._mapping) for row in rows])
+                self._snapshot = snapshot
+                self._details = {}
+            return snapshot
+
+    def list_all(self, db: Session) -> CachedJSON:
+        return self._current(db).all
+
+    def list_category(self, db: Session, category: str) -> CachedJSON:
+        snapshot = self._current(db)
+        cached = snapshot.by_category.get(category)
+        if cached is None:
+            cached = CachedJSON([])
+        return cached
+
+    def categories(self, db: Session) -> CachedJSON:
+        return self._current(db).categories
+
+    def sample(self, db: Session, k: int) -> List[dict]:
+        """k random active tools; O(k) against the cached listing, no table scan."""
+        tools = self._current(db).tools
+        return random.sample(tools, max(0, min(k, len(tools))))
+
+    def detail(self, db: Session, slug: str) -> Optional[CachedJSON]:
+        """Full public record for one tool (any status), or None if the slug is unknown."""
+        self._current(db)  # Expire stale details together with the listing
+        cached = self._details.get(slug)
+        if cached is not None:
+            return cached
+
+        version = self.version
+        row = db.query(*DETAIL_COLUMNS).filter(FreeTool.slug == slug).first()
+        if row is None:
+            return None
+        cached = CachedJSON(dict(row._mapping))
+        # Don't store a row read before an invalidation that happened meanwhile
+        if version == self.version:
+            self._details[slug] = cached
+        return cached
+
+tool_catalog = ToolCatalog()
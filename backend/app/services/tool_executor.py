@@ -13,215 +13,461 @@ import random
 import io
 import pypdf
 import inspect
+import ast
 import sys
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
 
-def execute_tool(tool_code: str, **kwargs) -> Dict[str, Any]:
+# Max number of compiled tools kept per process (LRU eviction beyond this)
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "256"))
+
+_tool_cache: "OrderedDict[tuple, CompiledTool]" = OrderedDict()
+_tool_cache_lock = threading.Lock()
+
+# Populated once by bootstrap_tool_runtime()
+_runtime_ready = False
+_runtime_lock = threading.Lock()
+_BASE_BUILTINS: "MappingProxyType" = None
+_BASE_MODULES: "MappingProxyType" = None
+
+# Max characters of printed output kept per call; the rest is dropped
+TOOL_OUTPUT_LIMIT = int(os.getenv("TOOL_OUTPUT_LIMIT", str(1024 * 1024)))
+
+# Output buffer of the tool call running in the current thread/task, if any
+_current_output: ContextVar = ContextVar("tool_output", default=None)
+
+class _BoundedOutput:
+    """Collects printed text for one tool call, up to a fixed size."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.truncated = False
+        self._parts = []
+        self._size = 0
+
+    def write(self, text: str) -> int:
+        room = self.limit - self._size
+        if room <= 0:
+            self.truncated = True
+            return len(text)
+        if len(text) > room:
+            self.truncated = True
+            self._parts.append(text[:room])
+            self._size = self.limit
+        else:
+            self._parts.append(text)
+            self._size += len(text)
+        return len(text)
+
+    def getvalue(self) -> str:
+        return ''.join(self._parts)
+
+class _StdoutRouter:
     """
-    Safely execute tool code with provided inputs.
-    Returns the tool's output.
+    Stand-in for sys.stdout that sends writes to the current tool call's buffer.
+    Unlike redirect_stdout it never swaps the global per call, so concurrent
+    calls in different threads keep their output apart.
     """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        output = _current_output.get()
+        if output is None:
+            return self._stream.write(text)
+        return output.write(text)
+
+    def flush(self):
+        if _current_output.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+@contextmanager
+def _capture_output():
+    if not isinstance(sys.stdout, _StdoutRouter):
+        sys.stdout = _StdoutRouter(sys.stdout)
+    output = _BoundedOutput(TOOL_OUTPUT_LIMIT)
+    token = _current_output.set(output)
     try:
-        if 'PyPDF2' not in sys.modules:
-            # Create a fake module for PyPDF2 if it's not installed, pointing to pypdf
-            # This is safer than just relying on namespace injection
-            import types
-            shim_module = types.ModuleType('PyPDF2')
-            shim_module.PdfFileReader = pypdf.PdfReader
-            shim_module.PdfFileWriter = pypdf.PdfWriter
+        yield output
+    finally:
+        _current_output.reset(token)
+
+class CompiledTool:
+    """
+    A tool's code object plus what its syntax tree tells about it: the name of
+    its entry point and the argument-binding plan derived from its signature.
+    Nothing is executed at compile time. Every call execs the code into a fresh
+    namespace, so state left behind by one call never reaches the next.
+    entry_point / params are None when they can't be read statically (e.g. an
+    entry point bound by assignment or wrapped by a decorator); they are then
+    resolved from the namespace at call time.
+    """
+    __slots__ = ("code", "entry_point", "params")
+
+    def __init__(self, code, entry_point, params):
+        self.code = code
+        self.entry_point = entry_point
+        self.params = params
+
+    def load(self):
+        """Exec the code into a fresh namespace and return its entry point."""
+        namespace = _new_namespace()
+        exec(self.code, namespace)
+        func = namespace.get(self.entry_point) if self.entry_point else None
+        return func if func is not None else _find_entry_point(namespace)
+
+def _install_compat_shims():
+    """Patch third-party libraries the way generated tool code expects them. Runs once per process."""
+    if 'PyPDF2' not in sys.modules:
+        # Create a fake module for PyPDF2 if it's not installed, pointing to pypdf
+        # This is safer than just relying on namespace injection
+        import types
+        shim_module = types.ModuleType('PyPDF2')
+        shim_module.PdfFileReader = pypdf.PdfReader
+        shim_module.PdfFileWriter = pypdf.PdfWriter
+        
+        # Copy other pypdf attributes to shim
+        for attr in dir(pypdf):
+            if not attr.startswith('_'):
+                setattr(shim_module, attr, getattr(pypdf, attr))
+        
+        sys.modules['PyPDF2'] = shim_module
+
+    # Monkeypatch PIL ImageFont.getsize if missing (removed in Pillow 10)
+    try:
+        from PIL import ImageFont
+        if not hasattr(ImageFont.FreeTypeFont, 'getsize'):
+            def getsize_shim(self, text, *args, **kwargs):
+                left, top, right, bottom = self.getbbox(text, *args, **kwargs)
+                return (right - left, bottom - top)
+            ImageFont.FreeTypeFont.getsize = getsize_shim
+            ImageFont.ImageFont.getsize = getsize_shim # Also base class just in case
+    except ImportError:
+        pass
+
+    # Monkeypatch PIL Image.open to handle bytes automatically
+    try:
+        from PIL import Image
+        if not hasattr(Image, '_original_open'):
+            Image._original_open = Image.open
+            def safe_open(fp, mode='r', formats=None):
+                if isinstance(fp, bytes):
+                    fp = io.BytesIO(fp)
+                return Image._original_open(fp, mode, formats)
+            Image.open = safe_open
+    except ImportError:
+        pass
+
+    # Monkeypatch pypdf.PdfReader to handle bytes automatically
+    # This also covers the PyPDF2 shim since it points to this class
+    if not hasattr(pypdf.PdfReader, '_original_init'):
+        pypdf.PdfReader._original_init = pypdf.PdfReader.__init__
+        def safe_pdf_init(self, stream, *args, **kwargs):
+            if isinstance(stream, bytes):
+                stream = io.BytesIO(stream)
+            pypdf.PdfReader._original_init(self, stream, *args, **kwargs)
+        pypdf.PdfReader.__init__ = safe_pdf_init
+
+def _build_base_namespace():
+    # Custom import to force using our shims if needed
+    original_import = __builtins__['__import__']
+    def custom_import(name, *args, **kwargs):
+        if name == 'PyPDF2':
+             return sys.modules['PyPDF2']
+        return original_import(name, *args, **kwargs)
+
+    # Safe built-ins exposed to tool code
+    safe_builtins = {
+        '__import__': custom_import,  # Intercept imports
+        'len': len,
+        'str': str,
+        'int': int,
+        'float': float,
+        'bool': bool,
+        'list': list,
+        'dict': dict,
+        'tuple': tuple,
+        'range': range,
+        'enumerate': enumerate,
+        'zip': zip,
+        'map': map,
+        'filter': filter,
+        'min': min,
+        'max': max,
+        'sum': sum,
+        'abs': abs,
+        'round': round,
+        'isinstance': isinstance,
+        'type': type,
+        'bytes': bytes,
+        'bytearray': bytearray,
+        'open': open,
+        'print': print,
+        'sorted': sorted,
+        'reversed': reversed,
+        'any': any,
+        'all': all,
+        'hasattr': hasattr,
+        'getattr': getattr,
+        'setattr': setattr,
+        'Exception': Exception,
+        'ValueError': ValueError,
+        'TypeError': TypeError,
+        'IndexError': IndexError,
+        'KeyError': KeyError,
+        'ImportError': ImportError,
+        'AttributeError': AttributeError,
+        'RuntimeError': RuntimeError,
+        '__build_class__': __build_class__,  # Required for class definitions (FPDF, etc)
+        '__name__': '__main__',  # Some libraries check this
+    }
+
+    # Safe modules exposed to tool code
+    modules = {
+        'json': json,
+        'base64': base64,
+        'hashlib': hashlib,
+        'secrets': secrets,
+        'string': string,
+        'difflib': difflib,
+        'quote': quote,
+        'unquote': unquote,
+        'uuid': uuid,
+        're': re,
+        'random': random,
+        'io': io,
+        'PyPDF2': sys.modules.get('PyPDF2'), # Enhanced Shim
+        'pypdf': pypdf,
+    }
+    return MappingProxyType(safe_builtins), MappingProxyType(modules)
+
+def bootstrap_tool_runtime() -> float:
+    """
+    Install the compatibility shims and build the frozen base namespace.
+    Called once at worker startup; execute_tool falls back to it lazily.
+    Returns the time spent in seconds.
+    """
+    global _runtime_ready, _BASE_BUILTINS, _BASE_MODULES
+    with _runtime_lock:
+        if _runtime_ready:
+            return 0.0
+        started = time.perf_counter()
+        _install_compat_shims()
+        if not isinstance(sys.stdout, _StdoutRouter):
+            sys.stdout = _StdoutRouter(sys.stdout)
+        _BASE_BUILTINS, _BASE_MODULES = _build_base_namespace()
+        _runtime_ready = True
+        return time.perf_counter() - started
+
+def _new_namespace() -> Dict[str, Any]:
+    # Shallow copies keep the frozen base intact if tool code rebinds globals or builtins
+    namespace = dict(_BASE_MODULES)
+    namespace['__builtins__'] = dict(_BASE_BUILTINS)
+    return namespace
+
+def _find_entry_point(namespace: Dict[str, Any]):
+    # Smart Function Discovery
+    # If 'execute' is missing, look for 'main', 'run', or the only function defined
+    entry_point = 'execute'
+    if entry_point not in namespace:
+        candidates = ['main', 'run', 'process', 'handler']
+        for c in candidates:
+            if c in namespace:
+                entry_point = c
+                break
+        
+        # If still not found, check if there is exactly one user-defined function
+        if entry_point not in namespace:
+            functions = [obj for name, obj in namespace.items() 
+                       if inspect.isfunction(obj) and obj.__module__ == None] # __module__ is None for exec-ed functions usually
+            if len(functions) == 1:
+                # Find the name of this function
+                for name, obj in namespace.items():
+                     if obj == functions[0]:
+                         entry_point = name
+                         break
+
+    return namespace.get(entry_point)
+
+def _top_level_functions(body, found=None) -> Dict[str, ast.FunctionDef]:
+    # Module-level defs, including those under top-level if/try/with blocks
+    if found is None:
+        found = {}
+    for node in body:
+        if isinstance(node, ast.FunctionDef):
+            found[node.name] = node
+        elif isinstance(node, (ast.If, ast.Try, ast.With)):
+            for block in ('body', 'orelse', 'finalbody'):
+                _top_level_functions(getattr(node, block, []), found)
+            for handler in getattr(node, 'handlers', []):
+                _top_level_functions(handler.body, found)
+    return found
+
+def _static_entry_point(tree: ast.Module):
+    """Same discovery rules as _find_entry_point, applied to the module's defs."""
+    functions = _top_level_functions(tree.body)
+    for name in ['execute', 'main', 'run', 'process', 'handler']:
+        if name in functions:
+            return functions[name]
+    if len(functions) == 1:
+        return next(iter(functions.values()))
+    return None
+
+def _params_from_ast(func: ast.FunctionDef):
+    args = func.args
+    names = [a.arg for a in args.posonlyargs + args.args]
+    if args.vararg:
+        names.append(args.vararg.arg)
+    names += [a.arg for a in args.kwonlyargs]
+    params = [(name, False) for name in names]
+    if args.kwarg:
+        params.append((args.kwarg.arg, True))
+    return tuple(params)
+
+def _params_from_signature(func):
+    return tuple(
+        (p.name, p.kind == p.VAR_KEYWORD)
+        for p in inspect.signature(func).parameters.values()
+    )
+
+def _compile_tool(tool_code: str) -> CompiledTool:
+    # Parsed and compiled only: module-level code first runs on the first call
+    tree = ast.parse(tool_code, "<tool>")
+    code = compile(tree, "<tool>", "exec")
+
+    entry_point = params = None
+    func = _static_entry_point(tree)
+    if func is not None:
+        entry_point = func.name
+        # The binding plan is read off the def once and replayed on every call;
+        # decorators may change the signature, so those are introspected per call
+        if not func.decorator_list:
+            params = _params_from_ast(func)
+    return CompiledTool(code, entry_point, params)
+
+def get_compiled_tool(tool_code: str, tool_id=None) -> CompiledTool:
+    """
+    Return the compiled tool for (tool_id, hash of tool_code), compiling on a miss.
+    Without a tool_id the code is compiled fresh and not cached.
+    """
+    if tool_id is None:
+        return _compile_tool(tool_code)
+
+    key = (str(tool_id), hashlib.sha256(tool_code.encode('utf-8')).hexdigest())
+    with _tool_cache_lock:
+        compiled = _tool_cache.get(key)
+        if compiled is not None:
+            _tool_cache.move_to_end(key)
+            return compiled
+
+    compiled = _compile_tool(tool_code)
+
+    with _tool_cache_lock:
+        _tool_cache[key] = compiled
+        _tool_cache.move_to_end(key)
+        while len(_tool_cache) > TOOL_CACHE_SIZE:
+            _tool_cache.popitem(last=False)
+    return compiled
+
+def invalidate_tool_cache(tool_id=None):
+    """
+    Drop cached compiled code for a tool (all code versions), or everything if no id is given.
+    """
+    with _tool_cache_lock:
+        if tool_id is None:
+            _tool_cache.clear()
+            return
+        tool_key = str(tool_id)
+        for key in [k for k in _tool_cache if k[0] == tool_key]:
+            del _tool_cache[key]
+
+def _bind_arguments(params, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Map request inputs onto the entry point's parameters using the precomputed plan."""
+    func_args = {}
+    
+    # prioritized inputs from system
+    primary_input = kwargs.get('input_file') or kwargs.get('input_data')
+    for i, (name, is_var_keyword) in enumerate(params):
+        # 0. Special case for multi-input signature execute(inputs: dict)
+        if name == 'inputs' and len(params) == 1 and name not in kwargs:
+            func_args[name] = kwargs
+            continue
+
+        # 1. Check exact match
+        if name in kwargs:
+            func_args[name] = kwargs[name]
+            continue
             
-            # Copy other pypdf attributes to shim
-            for attr in dir(pypdf):
-                if not attr.startswith('_'):
-                    setattr(shim_module, attr, getattr(pypdf, attr))
+        # 2. Check for smart mappings
+        if name == 'input_data' and 'input_file' in kwargs:
+            func_args[name] = kwargs['input_file']
+            continue
+        if name == 'input_file' and 'input_data' in kwargs:
+            func_args[name] = kwargs['input_data']
+            continue
             
-            sys.modules['PyPDF2'] = shim_module
-
-        # Monkeypatch PIL ImageFont.getsize if missing (removed in Pillow 10)
-        try:
-            from PIL import ImageFont
-            if not hasattr(ImageFont.FreeTypeFont, 'getsize'):
-                def getsize_shim(self, text, *args, **kwargs):
-                    left, top, right, bottom = self.getbbox(text, *args, **kwargs)
-                    return (right - left, bottom - top)
-                ImageFont.FreeTypeFont.getsize = getsize_shim
-                ImageFont.ImageFont.getsize = getsize_shim # Also base class just in case
-        except ImportError:
-            pass
-
-        # Monkeypatch PIL Image.open to handle bytes automatically
-        try:
-            from PIL import Image
-            if not hasattr(Image, '_original_open'):
-                Image._original_open = Image.open
-                def safe_open(fp, mode='r', formats=None):
-                    if isinstance(fp, bytes):
-                        fp = io.BytesIO(fp)
-                    return Image._original_open(fp, mode, formats)
-                Image.open = safe_open
-        except ImportError:
-            pass
-
-        # Monkeypatch pypdf.PdfReader to handle bytes automatically
-        # This also covers the PyPDF2 shim since it points to this class
-        if not hasattr(pypdf.PdfReader, '_original_init'):
-            pypdf.PdfReader._original_init = pypdf.PdfReader.__init__
-            def safe_pdf_init(self, stream, *args, **kwargs):
-                if isinstance(stream, bytes):
-                    stream = io.BytesIO(stream)
-                pypdf.PdfReader._original_init(self, stream, *args, **kwargs)
-            pypdf.PdfReader.__init__ = safe_pdf_init
-
-        # Custom import to force using our shims if needed
-        original_import = __builtins__['__import__']
-        def custom_import(name, *args, **kwargs):
-            if name == 'PyPDF2':
-                 return sys.modules['PyPDF2']
-            return original_import(name, *args, **kwargs)
-
-        # Create a namespace with safe built-ins and modules
-        namespace = {
-            '__builtins__': {
-                '__import__': custom_import,  # Intercept imports
-                'len': len,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-                'list': list,
-                'dict': dict,
-                'tuple': tuple,
-                'range': range,
-                'enumerate': enumerate,
-                'zip': zip,
-                'map': map,
-                'filter': filter,
-                'min': min,
-                'max': max,
-                'sum': sum,
-                'abs': abs,
-                'round': round,
-                'isinstance': isinstance,
-                'type': type,
-                'bytes': bytes,
-                'bytearray': bytearray,
-                'open': open,
-                'print': print,
-                'sorted': sorted,
-                'reversed': reversed,
-                'any': any,
-                'all': all,
-                'hasattr': hasattr,
-                'getattr': getattr,
-                'setattr': setattr,
-                'Exception': Exception,
-                'ValueError': ValueError,
-                'TypeError': TypeError,
-                'IndexError': IndexError,
-                'KeyError': KeyError,
-                'ImportError': ImportError,
-                'AttributeError': AttributeError,
-                'RuntimeError': RuntimeError,
-                '__build_class__': __build_class__,  # Required for class definitions (FPDF, etc)
-                '__name__': '__main__',  # Some libraries check this
-            },
-            # Add safe modules
-            'json': json,
-            'base64': base64,
-            'hashlib': hashlib,
-            'secrets': secrets,
-            'string': string,
-            'difflib': difflib,
-            'quote': quote,
-            'unquote': unquote,
-            'uuid': uuid,
-            're': re,
-            'random': random,
-            'io': io,
-            'PyPDF2': sys.modules.get('PyPDF2'), # Enhanced Shim
-            'pypdf': pypdf,
-        }
+        # 3. Handle specific commonly used names by AI
+        if name in ['input', 'data', 'file', 'content', 'text', 'string', 'blob']:
+             if primary_input is not None:
+                 func_args[name] = primary_input
+                 continue
+        
+        # 4. Fallback: If it's the first argument and we have a primary input, use it
+        if i == 0 and primary_input is not None and name not in func_args:
+            func_args[name] = primary_input
+            continue
         
+        # 5. Handle kwargs
+        if is_var_keyword:
+            func_args.update(kwargs)
+
+    return func_args
+
+def encode_bytes(obj):
+    """Recursively base64-encode bytes so a tool result can be serialized as JSON."""
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode('utf-8')
+    if isinstance(obj, dict):
+        return {k: encode_bytes(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [encode_bytes(i) for i in obj]
+    return obj
+
+def execute_tool(tool_code: str, tool_id=None, raw_bytes: bool = False, /, **kwargs) -> Dict[str, Any]:
+    """
+    Safely execute tool code with provided inputs.
+    When tool_id is given, the compiled tool is reused from the process-wide cache.
+    With raw_bytes, binary outputs are returned as bytes instead of base64 strings.
+    Returns the tool's output.
+    """
+    try:
+        if not _runtime_ready:
+            bootstrap_tool_runtime()
+
         # Execute the tool code
         # Capture stdout in case the tool prints instead of returning
-        from contextlib import redirect_stdout
-        
-        f = io.StringIO()
-        with redirect_stdout(f):
-            exec(tool_code, namespace)
-            
-            # Smart Function Discovery
-            # If 'execute' is missing, look for 'main', 'run', or the only function defined
-            entry_point = 'execute'
-            if entry_point not in namespace:
-                candidates = ['main', 'run', 'process', 'handler']
-                for c in candidates:
-                    if c in namespace:
-                        entry_point = c
-                        break
-                
-                # If still not found, check if there is exactly one user-defined function
-                if entry_point not in namespace:
-                    functions = [obj for name, obj in namespace.items() 
-                               if inspect.isfunction(obj) and obj.__module__ == None] # __module__ is None for exec-ed functions usually
-                    if len(functions) == 1:
-                        # Find the name of this function
-                        for name, obj in namespace.items():
-                             if obj == functions[0]:
-                                 entry_point = name
-                                 break
-
-            if entry_point not in namespace:
+        with _capture_output() as f:
+            compiled = get_compiled_tool(tool_code, tool_id)
+            func = compiled.load()
+
+            if func is None:
                 return {
                     "success": False,
                     "error": "Tool code must define an 'execute', 'main', or 'run' function"
                 }
 
-            # Introspect the execute function to handle flexible inputs
-            func = namespace[entry_point]
-            sig = inspect.signature(func)
-            func_args = {}
-            params = list(sig.parameters.values())
-            
-            # prioritized inputs from system
-            primary_input = kwargs.get('input_file') or kwargs.get('input_data')
-            for i, param in enumerate(params):
-                name = param.name
-                
-                # 0. Special case for multi-input signature execute(inputs: dict)
-                if name == 'inputs' and len(params) == 1 and name not in kwargs:
-                    func_args[name] = kwargs
-                    continue
-
-                # 1. Check exact match
-                if name in kwargs:
-                    func_args[name] = kwargs[name]
-                    continue
-                    
-                # 2. Check for smart mappings
-                if name == 'input_data' and 'input_file' in kwargs:
-                    func_args[name] = kwargs['input_file']
-                    continue
-                if name == 'input_file' and 'input_data' in kwargs:
-                    func_args[name] = kwargs['input_data']
-                    continue
-                    
-                # 3. Handle specific commonly used names by AI
-                if name in ['input', 'data', 'file', 'content', 'text', 'string', 'blob']:
-                     if primary_input is not None:
-                         func_args[name] = primary_input
-                         continue
-                
-                # 4. Fallback: If it's the first argument and we have a primary input, use it
-                if i == 0 and primary_input is not None and name not in func_args:
-                    func_args[name] = primary_input
-                    continue
-                
-                # 5. Handle kwargs
-                if param.kind == param.VAR_KEYWORD:
-                    func_args.update(kwargs)
-                    
             # Execute
-            result = func(**func_args)
+            params = compiled.params if compiled.params is not None else _params_from_signature(func)
+            result = func(**_bind_arguments(params, kwargs))
         
         # Capture printed output if result is None
         printed_output = f.getvalue().strip()
@@ -243,24 +489,20 @@ def execute_tool(tool_code: str, **kwargs) -> Dict[str, Any]:
         elif hasattr(v, 'tolist'): # Numpy arrays
             result = v.tolist()
 
-        # Helper to recursively encode bytes
-        def encode_bytes(obj):
-            if isinstance(obj, bytes):
-                return base64.b64encode(obj).decode('utf-8')
-            if isinstance(obj, dict):
-                return {k: encode_bytes(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [encode_bytes(i) for i in obj]
-            return obj
-            
-        result = encode_bytes(result)
+        # Binary responses send bytes as-is; JSON responses need them base64-encoded
+        if not raw_bytes:
+            result = encode_bytes(result)
         
         # Auto-wrap result if it doesn't match expected schema
         if not isinstance(result, dict) or 'success' not in result:
-             return {
+             result = {
                 "success": True,
                 "output": result
             }
+
+        # Printed output beyond TOOL_OUTPUT_LIMIT was dropped
+        if f.truncated:
+            result = {**result, "output_truncated": True}
             
         return result
         
@@ -0,0 +1,231 @@
+# backend/app/services/tool_pool.py
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+
+from .tool_executor import execute_tool
+from .tool_uploads import open_uploads
+
+# Pool sizing and limits (override via environment)
+TOOL_POOL_WORKERS = int(os.getenv("TOOL_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+TOOL_POOL_MAX_JOBS_PER_WORKER = int(os.getenv("TOOL_POOL_MAX_JOBS_PER_WORKER", "200"))
+TOOL_POOL_MEMORY_LIMIT_MB = int(os.getenv("TOOL_POOL_MEMORY_LIMIT_MB", "2048"))  # 0 disables the limit
+# Default limit; a tool's own FreeTool.timeout_seconds takes precedence.
+# With TOOL_POOL_WORKERS=0 tools run on threads, which can't be stopped: the caller
+# still gets a timeout error after this long, but the thread runs to completion.
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+
+# Extra time the parent waits past the in-worker alarm before killing the stuck worker
+HARD_TIMEOUT_GRACE_SECONDS = 5.0
+
+# Heavy libraries generated tools commonly use, imported once per worker
+PRELOAD_MODULES = ["PIL.Image", "PIL.ImageFont", "pypdf", "pandas", "fpdf"]
+
+class ToolTimeoutError(Exception):
+    pass
+
+def _init_worker(memory_limit_mb: int):
+    """Runs once in every worker process before it accepts jobs."""
+    if memory_limit_mb > 0:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"Tool worker: could not apply memory limit: {e}")
+
+    import importlib
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+
+    from .tool_executor import bootstrap_tool_runtime
+    bootstrap_tool_runtime()
+
+def _on_alarm(signum, frame):
+    raise ToolTimeoutError("Tool exceeded its time limit")
+
+def _run_job(tool_code: str, tool_id, raw_bytes: bool, kwargs: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    # Soft timeout inside the worker: interrupts Python-level loops and lets
+    # execute_tool report the error normally. C extensions that never return
+    # to the interpreter are handled by the parent's hard timeout.
+    signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            with open_uploads(kwargs) as inputs:
+                return execute_tool(tool_code, tool_id, raw_bytes, **inputs)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except ToolTimeoutError:
+        # Alarm fired outside the tool's own try/except
+        return {
+            "success": False,
+            "error": f"Execution timed out (max {timeout:g} seconds)"
+        }
+
+def _ping():
+    return os.getpid()
+
+class ToolExecutionPool:
+    """
+    Pool of pre-warmed worker processes that run free-tool code off the event loop.
+    Workers are recycled after roughly max_jobs_per_worker jobs each and run under an address-space limit.
+    """
+
+    def __init__(
+        self,
+        workers: int = TOOL_POOL_WORKERS,
+        max_jobs_per_worker: int = TOOL_POOL_MAX_JOBS_PER_WORKER,
+        memory_limit_mb: int = TOOL_POOL_MEMORY_LIMIT_MB,
+        default_timeout: float = TOOL_TIMEOUT_SECONDS
+    ):
+        self.workers = workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.memory_limit_mb = memory_limit_mb
+        self.default_timeout = default_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs_on_executor = 0
+        self._warmup = []
+        # Jobs still awaited per executor, and executors retired because a job hung
+        self._inflight: Dict[ProcessPoolExecutor, int] = {}
+        self._retired = set()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.memory_limit_mb,)
+        )
+        self._jobs_on_executor = 0
+        # Submitting one ping per worker forces every process to spawn and preload now
+        self._warmup = [executor.submit(_ping) for _ in range(self.workers)]
+        return executor
+
+    def start(self):
+        """
+        Spawn all workers up front so the first requests don't pay the import cost.
+        Workers preload in the background; startup does not wait for them.
+        """
+        if self.workers <= 0 or self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        threading.Thread(
+            target=self._report_warmup, args=(self._warmup,), name="tool-pool-warmup", daemon=True
+        ).start()
+
+    def _report_warmup(self, warmup):
+        started = time.monotonic()
+        try:
+            for f in warmup:
+                f.result()
+        except Exception as e:
+            print(f"Tool pool: worker warmup failed: {e}")
+            return
+        print(f"Tool pool started with {len(warmup)} worker(s) in {time.monotonic() - started:.1f}s")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _recycle(self):
+        # Workers are recycled a generation at a time: new jobs go to a fresh pool while
+        # the old one drains its in-flight jobs and exits. (max_tasks_per_child can hang
+        # on Python 3.11 when workers are replaced, so it is not used.)
+        old = self._executor
+        self._executor = self._create_executor()
+        old.shutdown(wait=False)
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        # A crashed worker breaks the whole ProcessPoolExecutor; replace it once
+        if self._executor is broken:
+            self._executor = self._create_executor()
+
+    def _retire(self, executor: ProcessPoolExecutor):
+        """
+        A job on this executor is stuck past its hard timeout. Killing its worker
+        would break every other job on the executor, so new jobs go to a fresh pool
+        and the stuck worker is terminated once the others have finished.
+        """
+        if self._executor is executor:
+            self._executor = self._create_executor()
+        self._retired.add(executor)
+        self._reap(executor)
+
+    def _reap(self, executor: ProcessPoolExecutor):
+        if self._inflight.get(executor, 0) > 0:
+            return
+        self._inflight.pop(executor, None)
+        if executor not in self._retired:
+            return
+        self._retired.discard(executor)
+        # Only the stuck workers are still busy; ProcessPoolExecutor can't cancel them
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(
+        self,
+        tool_code: str,
+        tool_id=None,
+        kwargs: Dict[str, Any] = None,
+        timeout: float = None,
+        raw_bytes: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run a tool in a worker process and return execute_tool's result dict.
+        Falls back to the default thread pool when the process pool is disabled.
+        """
+        kwargs = kwargs or {}
+        timeout = timeout or self.default_timeout
+        loop = asyncio.get_running_loop()
+
+        timed_out = {
+            "success": False,
+            "error": f"Execution timed out (max {timeout:g} seconds)"
+        }
+
+        if self._executor is None:
+            # Threads can't be interrupted: the request is bounded, the thread is not
+            def run_inline():
+                with open_uploads(kwargs) as inputs:
+                    return execute_tool(tool_code, tool_id, raw_bytes, **inputs)
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(None, run_inline), timeout)
+            except asyncio.TimeoutError:
+                return timed_out
+
+        if self.max_jobs_per_worker and self._jobs_on_executor >= self.workers * self.max_jobs_per_worker:
+            self._recycle()
+        self._jobs_on_executor += 1
+
+        executor = self._executor
+        self._inflight[executor] = self._inflight.get(executor, 0) + 1
+        try:
+            job = loop.run_in_executor(executor, _run_job, tool_code, tool_id, raw_bytes, kwargs, timeout)
+            return await asyncio.wait_for(job, timeout + HARD_TIMEOUT_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            self._retire(executor)
+            return timed_out
+        except BrokenProcessPool:
+            # Worker died, most likely from the memory limit
+            self._restart(executor)
+            return {
+                "success": False,
+                "error": "Execution failed: tool worker crashed (memory limit exceeded?)"
+            }
+        finally:
+            self._inflight[executor] = self._inflight.get(executor, 1) - 1
+            self._reap(executor)
+
+tool_pool = ToolExecutionPool()
@@ -0,0 +1,229 @@
+# backend/app/services/tool_uploads.py
+import json
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import multipart
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+MB = 1024 * 1024
+
+# Hard cap for a whole execute-file request, and the size above which an upload goes to disk
+TOOL_UPLOAD_MAX_MB = float(os.getenv("TOOL_UPLOAD_MAX_MB", "200"))
+TOOL_UPLOAD_SPOOL_MB = float(os.getenv("TOOL_UPLOAD_SPOOL_MB", "1"))
+TOOL_UPLOAD_DIR = os.getenv("TOOL_UPLOAD_DIR") or None  # None = system temp dir
+
+class SpooledUpload:
+    """
+    An upload too large to keep in memory. The bytes live in a temp file on disk;
+    only this small descriptor is passed to the tool worker, which maps the file.
+    """
+    __slots__ = ("path", "filename", "size")
+
+    def __init__(self, path: str, filename: Optional[str], size: int):
+        self.path = path
+        self.filename = filename
+        self.size = size
+
+class _Part:
+    __slots__ = ("name", "filename", "data", "file", "size", "limit")
+
+    def __init__(self):
+        self.name = None
+        self.filename = None
+        self.data = bytearray()
+        self.file = None
+        self.size = 0
+        self.limit = None
+
+def get_upload_limits(input_schema: Optional[str]) -> Tuple[int, Dict[str, int]]:
+    """
+    Derive size limits from a tool's input_schema.
+    Returns (request limit in bytes, {field name: per-file limit in bytes}).
+    """
+    request_limit = int(TOOL_UPLOAD_MAX_MB * MB)
+    field_limits = {}
+    try:
+        schema = json.loads(input_schema) if input_schema else []
+    except (TypeError, ValueError):
+        schema = []
+
+    file_fields = [f for f in schema if isinstance(f, dict) and f.get('type') in ('file', 'files')]
+    field_totals = []
+    for field in file_fields:
+        if field.get('max_size_mb') and field.get('name'):
+            field_limits[field['name']] = min(int(float(field['max_size_mb']) * MB), request_limit)
+            # max_size_mb is per file: a multi-file field only has a total when it declares max_files
+            multiple = field.get('type') == 'files' or field.get('multiple')
+            count = int(field.get('max_files') or 0) if multiple else 1
+            if count > 0:
+                field_totals.append(field_limits[field['name']] * count)
+
+    # When every file field is bounded, the whole body can be bounded too (plus room for text fields)
+    if file_fields and len(field_totals) == len(file_fields):
+        request_limit = min(request_limit, sum(field_totals) + MB)
+
+    return request_limit, field_limits
+
+async def parse_tool_form(
+    request: Request,
+    request_limit: int,
+    field_limits: Dict[str, int] = None
+) -> List[Tuple[str, Union[str, bytes, SpooledUpload], Optional[str]]]:
+    """
+    Stream a multipart/form-data body without buffering whole files in memory.
+    Returns (field name, value, filename) tuples: text fields as str, small uploads as bytes
+    and uploads larger than TOOL_UPLOAD_SPOOL_MB as SpooledUpload temp files.
+    Raises 413 as soon as a limit is crossed.
+    """
+    field_limits = field_limits or {}
+    spool_bytes = int(TOOL_UPLOAD_SPOOL_MB * MB)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > request_limit:
+        raise HTTPException(status_code=413, detail=f"Upload too large (max {request_limit // MB} MB)")
+
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data with a boundary")
+
+    items = []
+    spooled = []
+    state = {"part": None, "header_name": b"", "header_value": b"", "headers": {}}
+    pending_writes: List[Tuple[_Part, bytes]] = []
+
+    def on_part_begin():
+        state["part"] = _Part()
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header_name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_name"].lower()] = state["header_value"]
+        state["header_name"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        part = state["part"]
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail='Form part is missing a "name"')
+        part.name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" in options:
+            part.filename = options[b"filename"].decode("utf-8", errors="replace")
+            part.limit = field_limits.get(part.name)
+
+    def on_part_data(data, start, end):
+        part = state["part"]
+        chunk = data[start:end]
+        part.size += len(chunk)
+        if part.limit is not None and part.size > part.limit:
+            raise HTTPException(status_code=413, detail=f"File '{part.name}' too large (max {part.limit // MB} MB)")
+        if part.file is not None:
+            pending_writes.append((part, chunk))
+            return
+        part.data += chunk
+        # Roll uploads over to disk once they pass the spool threshold; the actual
+        # writes are queued and flushed off the event loop
+        if part.filename is not None and len(part.data) > spool_bytes:
+            part.file = tempfile.NamedTemporaryFile(prefix="tool_upload_", dir=TOOL_UPLOAD_DIR, delete=False)
+            spooled.append(part)
+            pending_writes.append((part, bytes(part.data)))
+            part.data = bytearray()
+
+    def on_part_end():
+        part = state["part"]
+        if part.filename is None:
+            items.append((part.name, part.data.decode("utf-8", errors="replace"), None))
+        elif part.file is not None:
+            items.append((part.name, part, part.filename))
+        else:
+            items.append((part.name, bytes(part.data), part.filename))
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > request_limit:
+                raise HTTPException(status_code=413, detail=f"Upload too large (max {request_limit // MB} MB)")
+            parser.write(chunk)
+            if pending_writes:
+                writes = pending_writes[:]
+                pending_writes.clear()
+                await run_in_threadpool(_write_chunks, writes)
+        parser.finalize()
+        if pending_writes:
+            await run_in_threadpool(_write_chunks, list(pending_writes))
+    except BaseException:
+        for part in spooled:
+            part.file.close()
+        discard_files([part.file.name for part in spooled])
+        raise
+
+    result = []
+    for name, value, filename in items:
+        if isinstance(value, _Part):
+            value.file.close()
+            value = SpooledUpload(value.file.name, filename, value.size)
+        result.append((name, value, filename))
+    return result
+
+def _write_chunks(writes):
+    for part, chunk in writes:
+        part.file.write(chunk)
+
+def discard_files(paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def discard_uploads(values):
+    """Delete the temp files behind any SpooledUpload among values."""
+    discard_files({v.path for v in values if isinstance(v, SpooledUpload)})
+
+@contextmanager
+def open_uploads(kwargs: Dict[str, Any]):
+    """
+    Swap SpooledUpload inputs for read-only memory maps of their temp files.
+    Tools get a bytes-like, seekable buffer without the file being copied into memory.
+    """
+    maps = {}
+    opened = {}
+    try:
+        for key, value in kwargs.items():
+            if not isinstance(value, SpooledUpload):
+                continue
+            if value.path not in maps:
+                with open(value.path, "rb") as f:
+                    maps[value.path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            opened[key] = maps[value.path]
+        yield {**kwargs, **opened} if opened else kwargs
+    finally:
+        for mapped in maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                # The tool kept a view into the map; it is released with the buffer
+                pass
@@ -0,0 +1,78 @@
+# backend/app/services/usage_counter.py
+import asyncio
+import os
+import threading
+from collections import Counter
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal
+
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "30"))
+
+class UsageCounter:
+    """
+    Per-process buffer for FreeTool.usage_count.
+    The request path only bumps an in-memory counter; a background task
+    writes the accumulated deltas to free_tools in a single UPDATE.
+    """
+
+    def __init__(self, interval: float = USAGE_FLUSH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def increment(self, tool_id, amount: int = 1):
+        with self._lock:
+            self._counts[str(tool_id)] += amount
+
+    def flush(self) -> int:
+        """Write buffered counts to the database. Returns the number of tools updated."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                text("""
+                    UPDATE free_tools AS t
+                    SET usage_count = COALESCE(t.usage_count, 0) + v.delta
+                    FROM unnest(CAST(:ids AS uuid[]), CAST(:deltas AS integer[])) AS v(id, delta)
+                    WHERE t.id = v.id
+                """),
+                {"ids": list(counts.keys()), "deltas": list(counts.values())}
+            )
+            db.commit()
+            return len(counts)
+        except Exception as e:
+            db.rollback()
+            print(f"Usage count flush failed, will retry: {e}")
+            # Put the counts back so they go out with the next flush
+            with self._lock:
+                self._counts.update(counts)
+            return 0
+        finally:
+            db.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await run_in_threadpool(self.flush)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+usage_counter = UsageCounter()
@@ -0,0 +1,260 @@
+# backend/app/services/user_stats.py
+import os
+from typing import Dict
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..database import engine
+
+# The hourly reconcile only re-checks users whose counters changed this recently,
+# in batches of this many users
+USER_STATS_RECONCILE_WINDOW_HOURS = float(os.getenv("USER_STATS_RECONCILE_WINDOW_HOURS", "2"))
+USER_STATS_RECONCILE_BATCH = int(os.getenv("USER_STATS_RECONCILE_BATCH", "500"))
+
+# Per-user advisory lock (two-key form). Triggers take it shared, so writers never
+# wait on each other; seeding and reconciling take it exclusively, so the aggregate
+# they compute cannot miss a write whose trigger found no row, or overwrite one
+# that landed after the aggregate was read.
+USER_LOCK_SQL = "hashtext('flowsaas_user_stats'), hashtext({user_id})"
+
+# Statement-level triggers with transition tables: a bulk insert from the sync
+# service or a status refresh touching many rows updates each user's counters
+# once per statement. Only existing user_stats rows are updated; a user's row is
+# created from the full aggregate the first time their stats are read.
+# (Postgres allows a single event per trigger when transition tables are used.)
+INSTALL_TRIGGERS_SQL = """
+SELECT pg_advisory_xact_lock(hashtext('flowsaas_user_stats'));
+
+CREATE OR REPLACE FUNCTION flowsaas_user_stats_lock(user_ids uuid[]) RETURNS void AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('flowsaas_user_stats'), k)
+    FROM (SELECT DISTINCT hashtext(u::text) AS k FROM unnest(user_ids) u WHERE u IS NOT NULL) keys
+    ORDER BY k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION flowsaas_user_stats_executions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM flowsaas_user_stats_lock(ARRAY(SELECT user_id FROM old_rows));
+    ELSE
+        PERFORM flowsaas_user_stats_lock(ARRAY(SELECT user_id FROM new_rows));
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        UPDATE user_stats s
+        SET total_executions = s.total_executions + d.total,
+            successful_executions = s.successful_executions + d.success,
+            updated_at = now()
+        FROM (
+            SELECT user_id, count(*) AS total, count(*) FILTER (WHERE status = 'SUCCESS') AS success
+            FROM new_rows WHERE user_id IS NOT NULL GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE user_stats s
+        SET successful_executions = s.successful_executions + d.success,
+            updated_at = now()
+        FROM (
+            SELECT n.user_id,
+                   sum(COALESCE(n.status = 'SUCCESS', FALSE)::int - COALESCE(o.status = 'SUCCESS', FALSE)::int) AS success
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.user_id IS NOT NULL
+            GROUP BY n.user_id
+        ) d
+        WHERE s.user_id = d.user_id AND d.success <> 0;
+    ELSE
+        UPDATE user_stats s
+        SET total_executions = s.total_executions - d.total,
+            successful_executions = s.successful_executions - d.success,
+            updated_at = now()
+        FROM (
+            SELECT user_id, count(*) AS total, count(*) FILTER (WHERE status = 'SUCCESS') AS success
+            FROM old_rows WHERE user_id IS NOT NULL GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION flowsaas_user_stats_instances() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM flowsaas_user_stats_lock(ARRAY(SELECT user_id FROM old_rows));
+    ELSE
+        PERFORM flowsaas_user_stats_lock(ARRAY(SELECT user_id FROM new_rows));
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        UPDATE user_stats s
+        SET active_automations = s.active_automations + d.active, updated_at = now()
+        FROM (SELECT user_id, count(*) AS active FROM new_rows WHERE is_active GROUP BY user_id) d
+        WHERE s.user_id = d.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE user_stats s
+        SET active_automations = s.active_automations + d.active, updated_at = now()
+        FROM (
+            SELECT n.user_id,
+                   sum(COALESCE(n.is_active, FALSE)::int - COALESCE(o.is_active, FALSE)::int) AS active
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            GROUP BY n.user_id
+        ) d
+        WHERE s.user_id = d.user_id AND d.active <> 0;
+    ELSE
+        UPDATE user_stats s
+        SET active_automations = s.active_automations - d.active, updated_at = now()
+        FROM (SELECT user_id, count(*) AS active FROM old_rows WHERE is_active GROUP BY user_id) d
+        WHERE s.user_id = d.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS flowsaas_user_stats_executions_insert ON executions;
+CREATE TRIGGER flowsaas_user_stats_executions_insert
+    AFTER INSERT ON executions REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_executions();
+DROP TRIGGER IF EXISTS flowsaas_user_stats_executions_update ON executions;
+CREATE TRIGGER flowsaas_user_stats_executions_update
+    AFTER UPDATE ON executions REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_executions();
+DROP TRIGGER IF EXISTS flowsaas_user_stats_executions_delete ON executions;
+CREATE TRIGGER flowsaas_user_stats_executions_delete
+    AFTER DELETE ON executions REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_executions();
+
+DROP TRIGGER IF EXISTS flowsaas_user_stats_instances_insert ON workflow_instances;
+CREATE TRIGGER flowsaas_user_stats_instances_insert
+    AFTER INSERT ON workflow_instances REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_instances();
+DROP TRIGGER IF EXISTS flowsaas_user_stats_instances_update ON workflow_instances;
+CREATE TRIGGER flowsaas_user_stats_instances_update
+    AFTER UPDATE ON workflow_instances REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_instances();
+DROP TRIGGER IF EXISTS flowsaas_user_stats_instances_delete ON workflow_instances;
+CREATE TRIGGER flowsaas_user_stats_instances_delete
+    AFTER DELETE ON workflow_instances REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION flowsaas_user_stats_instances();
+"""
+
+# Fallback / verification: the same three numbers straight from the source tables
+STATS_AGGREGATE_SQL = """
+    SELECT
+        (SELECT count(*) FROM workflow_instances wi WHERE wi.user_id = u.user_id AND wi.is_active) AS active_automations,
+        count(e.id) AS total_executions,
+        count(e.id) FILTER (WHERE e.status = 'SUCCESS') AS successful_executions
+    FROM (SELECT CAST(:user_id AS uuid) AS user_id) u
+    LEFT JOIN executions e ON e.user_id = u.user_id
+    GROUP BY u.user_id
+"""
+
+# Cleared when the triggers could not be installed; counters would go stale, so
+# reads use the aggregate query instead
+_counters_maintained = True
+
+def install_user_stats_triggers() -> bool:
+    global _counters_maintained
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(INSTALL_TRIGGERS_SQL)
+        _counters_maintained = True
+    except Exception as e:
+        print(f"User stats: could not install triggers, /auth/me will aggregate: {e}")
+        _counters_maintained = False
+    return _counters_maintained
+
+def _as_dict(row) -> Dict[str, int]:
+    return {
+        "active_automations": row[0],
+        "total_executions": row[1],
+        "successful_executions": row[2],
+    }
+
+def compute_user_stats(user_id: UUID, db: Session) -> Dict[str, int]:
+    """Counters computed from executions and workflow_instances in one query."""
+    return _as_dict(db.execute(text(STATS_AGGREGATE_SQL), {"user_id": str(user_id)}).one())
+
+def get_user_stats(user_id: UUID, db: Session) -> Dict[str, int]:
+    """
+    Dashboard counters for a user: one primary key read once the row exists.
+    The first read seeds the row from the aggregate query under the user's lock.
+    """
+    if not _counters_maintained:
+        return compute_user_stats(user_id, db)
+
+    row = db.execute(text("""
+        SELECT active_automations, total_executions, successful_executions
+        FROM user_stats WHERE user_id = CAST(:user_id AS uuid)
+    """), {"user_id": str(user_id)}).first()
+    if row:
+        return _as_dict(row)
+
+    try:
+        db.execute(text(f"SELECT pg_advisory_xact_lock({USER_LOCK_SQL.format(user_id=':user_id')})"),
+                   {"user_id": str(user_id)})
+        row = db.execute(text(f"""
+            INSERT INTO user_stats (user_id, active_automations, total_executions, successful_executions, updated_at)
+            SELECT CAST(:user_id AS uuid), a.active_automations, a.total_executions, a.successful_executions, now()
+            FROM ({STATS_AGGREGATE_SQL}) a
+            ON CONFLICT (user_id) DO UPDATE SET updated_at = user_stats.updated_at
+            RETURNING active_automations, total_executions, successful_executions
+        """), {"user_id": str(user_id)}).one()
+        db.commit()
+        return _as_dict(row)
+    except Exception as e:
+        db.rollback()
+        print(f"User stats: could not seed counters for {user_id}: {e}")
+        return compute_user_stats(user_id, db)
+
+def reconcile_user_stats(db: Session, window_hours: float = USER_STATS_RECONCILE_WINDOW_HOURS,
+                         batch_size: int = USER_STATS_RECONCILE_BATCH) -> int:
+    """
+    Verify the counter rows that changed in the last window_hours against the
+    aggregate and repair drift, batch_size users per transaction. Users whose
+    lock is busy are skipped until the next run. Returns the number of rows fixed.
+    """
+    fixed = 0
+    last_user_id = None
+    while True:
+        user_ids = db.execute(text("""
+            SELECT user_id FROM user_stats
+            WHERE updated_at > now() - make_interval(secs => :window)
+              AND (CAST(:after AS uuid) IS NULL OR user_id > CAST(:after AS uuid))
+            ORDER BY user_id
+            LIMIT :batch
+        """), {"window": window_hours * 3600, "after": last_user_id, "batch": batch_size}).scalars().all()
+        if not user_ids:
+            break
+        last_user_id = str(user_ids[-1])
+
+        # Locks first, in their own statement, so the aggregate below is read
+        # from a snapshot taken after every locked user's writers have committed
+        locked = db.execute(text(f"""
+            SELECT u.user_id FROM unnest(CAST(:user_ids AS uuid[])) AS u(user_id)
+            WHERE pg_try_advisory_xact_lock({USER_LOCK_SQL.format(user_id="u.user_id::text")})
+        """), {"user_ids": [str(u) for u in user_ids]}).scalars().all()
+
+        fixed += db.execute(text("""
+            UPDATE user_stats s
+            SET active_automations = a.active_automations,
+                total_executions = a.total_executions,
+                successful_executions = a.successful_executions,
+                updated_at = now()
+            FROM (
+                SELECT l.user_id,
+                    (SELECT count(*) FROM workflow_instances wi WHERE wi.user_id = l.user_id AND wi.is_active) AS active_automations,
+                    count(e.id) AS total_executions,
+                    count(e.id) FILTER (WHERE e.status = 'SUCCESS') AS successful_executions
+                FROM unnest(CAST(:user_ids AS uuid[])) AS l(user_id)
+                LEFT JOIN executions e ON e.user_id = l.user_id
+                GROUP BY l.user_id
+            ) a
+            WHERE s.user_id = a.user_id
+              AND (s.active_automations, s.total_executions, s.successful_executions)
+                  IS DISTINCT FROM (a.active_automations, a.total_executions, a.successful_executions)
+        """), {"user_ids": [str(u) for u in locked]}).rowcount
+        db.commit()
+    return fixed
@@ -0,0 +1,201 @@
+# backend/app/services/workflow_pool.py
+import asyncio
+import hashlib
+import hmac
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.security import SECRET_KEY
+from ..models import User, UserCredential, WorkflowInstance, WorkflowTemplate
+from .execution_watcher import OPEN_STATUSES
+from .n8n_client import n8n_client
+
+# Webhook-only workflows with no run request and no execution for this long are removed from n8n
+WORKFLOW_POOL_IDLE_HOURS = float(os.getenv("WORKFLOW_POOL_IDLE_HOURS", "24"))
+
+WEBHOOK_NODE_TYPE = "n8n-nodes-base.webhook"
+# Trigger nodes whose type does not end in "Trigger"
+LEGACY_TRIGGER_NODE_TYPES = {"n8n-nodes-base.cron", "n8n-nodes-base.interval", WEBHOOK_NODE_TYPE}
+
+def credential_fingerprint(credential_type: str, secret: str) -> str:
+    """Stable, non-reversible identifier for a credential value."""
+    message = f"{credential_type}\0{secret}".encode("utf-8")
+    return hmac.new(SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+def workflow_pool_key(template: WorkflowTemplate, credential_fingerprints: Iterable[str]) -> str:
+    """
+    Key for a webhook workflow rendered with credentials only. Runs of the same template
+    version with the same credentials share one n8n workflow; their inputs are sent as
+    webhook data and never end up in the workflow or the key.
+    """
+    updated_at = template.updated_at.isoformat() if template.updated_at else ""
+    material = "\0".join([str(template.id), updated_at, *sorted(credential_fingerprints)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def find_webhook_trigger(workflow_json: dict) -> Optional[Tuple[str, str]]:
+    """(http method, path) of the workflow's webhook trigger, if it has one."""
+    for node in workflow_json.get("nodes", []):
+        if node.get("type") == WEBHOOK_NODE_TYPE:
+            params = node.get("parameters", {})
+            path = params.get("path") or node.get("webhookId")
+            if path:
+                return params.get("httpMethod", "GET"), str(path).strip("/")
+    return None
+
+def is_webhook_only(workflow_json: dict) -> bool:
+    """True if the workflow is started only by its webhook (no schedule, poll or app trigger)."""
+    triggers = [
+        node.get("type", "") for node in workflow_json.get("nodes", [])
+        if node.get("type") in LEGACY_TRIGGER_NODE_TYPES or node.get("type", "").lower().endswith("trigger")
+    ]
+    return bool(triggers) and all(t == WEBHOOK_NODE_TYPE for t in triggers)
+
+class WorkflowPool:
+    """
+    Shares activated webhook workflows between runs of the same template with the
+    same credentials instead of creating and activating a new workflow every time.
+    Instances are per user, since they carry the user's credentials. Webhook-only
+    instances are collected by gc_idle() once nothing has used them for
+    WORKFLOW_POOL_IDLE_HOURS; scheduled and polling workflows run on their own and
+    are never collected.
+    """
+
+    def __init__(self, idle_hours: float = WORKFLOW_POOL_IDLE_HOURS):
+        self.idle_hours = idle_hours
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @asynccontextmanager
+    async def _lock(self, name: str):
+        # Per-process and best effort: a duplicate created by another worker is
+        # harmless and gets collected with the other idle instances
+        lock = self._locks[name]
+        try:
+            async with lock:
+                yield
+        finally:
+            if not lock.locked():
+                self._locks.pop(name, None)
+
+    async def get_credential(self, db: Session, user: User, credential_type: str, data_key: str, secret: str) -> str:
+        """n8n credential id for this user's secret, creating the credential only once."""
+        fingerprint = credential_fingerprint(credential_type, secret)
+        async with self._lock(f"cred:{user.id}:{fingerprint}"):
+            existing = db.query(UserCredential).filter(
+                UserCredential.user_id == user.id,
+                UserCredential.fingerprint == fingerprint
+            ).first()
+            if existing:
+                return existing.n8n_credential_id
+
+            name = f"USER_CRED_{user.email}_{fingerprint[:8]}"
+            print(f"User Run: Creating credential for {credential_type}...")
+            cred = await n8n_client.create_credential(
+                name=name,
+                credential_type=credential_type,
+                data={data_key: secret}
+            )
+            credential_id = str(cred.get('id'))
+            db.add(UserCredential(
+                user_id=user.id,
+                name=name,
+                credential_type=credential_type,
+                n8n_credential_id=credential_id,
+                fingerprint=fingerprint
+            ))
+            db.commit()
+            print(f"Credential created with ID: {credential_id}")
+            return credential_id
+
+    async def acquire(
+        self,
+        db: Session,
+        template: WorkflowTemplate,
+        user: User,
+        workflow_json: dict,
+        key: Optional[str] = None
+    ) -> Tuple[WorkflowInstance, bool]:
+        """
+        Activated instance for this rendered workflow: the pooled one for key, or a new
+        unpooled workflow when key is None. Returns (instance, created). A new workflow
+        is recorded only once n8n has activated it; otherwise it is deleted again and
+        an HTTPException is raised.
+        """
+        async with self._lock(f"wf:{user.id}:{key}") if key else nullcontext():
+            instance = None
+            if key:
+                instance = db.query(WorkflowInstance).filter(
+                    WorkflowInstance.user_id == user.id,
+                    WorkflowInstance.pool_key == key,
+                    WorkflowInstance.is_active == True
+                ).first()
+
+            created = instance is None
+            if created:
+                workflow_json = {**workflow_json, "name": f"USER_RUN: {template.name} ({user.email})"}
+                created_workflow = await n8n_client.create_workflow(workflow_json)
+                n8n_id = created_workflow.get('id')
+
+                # Activate so triggers (Schedule, Webhook) work; pooled ones already are
+                print(f"Activating workflow {n8n_id}...")
+                if not await n8n_client.activate_workflow(n8n_id):
+                    if not await n8n_client.delete_workflow(n8n_id):
+                        print(f"Workflow pool: could not delete unactivated n8n workflow {n8n_id}")
+                    raise HTTPException(status_code=500, detail=f"n8n could not activate workflow {n8n_id}")
+
+                instance = WorkflowInstance(
+                    user_id=user.id,
+                    template_id=str(template.id),
+                    is_active=True,
+                    n8n_workflow_id=n8n_id,
+                    pool_key=key,
+                    webhook_only=is_webhook_only(workflow_json)
+                )
+                db.add(instance)
+
+            instance.last_used_at = datetime.now(timezone.utc)
+            db.commit()
+            db.refresh(instance)
+            return instance, created
+
+    async def gc_idle(self, db: Session) -> int:
+        """
+        Deactivate and delete webhook-only workflows that have gone idle and have no
+        open run. Scheduled and polling workflows are never touched, however rarely
+        they fire. Returns how many were removed.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.idle_hours)
+        idle = db.execute(text("""
+            SELECT wi.id, wi.n8n_workflow_id
+            FROM workflow_instances wi
+            WHERE wi.webhook_only = TRUE
+              AND wi.is_active = TRUE
+              AND (wi.last_used_at IS NULL OR wi.last_used_at < :cutoff)
+              AND NOT EXISTS (
+                  SELECT 1 FROM executions e
+                  WHERE e.workflow_instance_id = wi.id
+                    AND (e.started_at >= :cutoff OR e.status = ANY(:open))
+              )
+        """), {"cutoff": cutoff, "open": list(OPEN_STATUSES)}).fetchall()
+
+        removed = 0
+        for instance_id, n8n_workflow_id in idle:
+            if n8n_workflow_id:
+                await n8n_client.deactivate_workflow(n8n_workflow_id)
+                if not await n8n_client.delete_workflow(n8n_workflow_id):
+                    print(f"Workflow pool: could not delete n8n workflow {n8n_workflow_id}, will retry")
+                    continue
+            db.query(WorkflowInstance).filter(WorkflowInstance.id == instance_id).update(
+                {WorkflowInstance.is_active: False}, synchronize_session=False
+            )
+            db.commit()
+            removed += 1
+        return removed
+
+workflow_pool = WorkflowPool()
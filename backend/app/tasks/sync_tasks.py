@@ -1,40 +1,165 @@
 # backend/app/tasks/sync_tasks.py
-from celery import shared_task
+import os
+import time
+from celery import shared_task, chord
 from ..database import SessionLocal
-from ..services.sync_service import sync_executions_for_user
+from ..services.sync_service import sync_executions_for_user, sync_all_executions_global
+from ..services.redis_lock import acquire_lock, release_lock, extend_lock, get_redis
 from ..models import User
 
+# "global": one pass over new n8n executions for all workflows (cost follows new rows)
+# "sharded": per-user sync fanned out over SYNC_SHARDS subtasks
+SYNC_MODE = os.getenv("SYNC_MODE", "global")
+# Number of user-id hash ranges the periodic sync is split into
+SYNC_SHARDS = int(os.getenv("SYNC_SHARDS", "8"))
+# Lock lifetime without a heartbeat. Running syncs keep extending it, so this only
+# bounds how long a run that died keeps the next one from starting
+SYNC_LOCK_TTL_SECONDS = int(os.getenv("SYNC_LOCK_TTL_SECONDS", "900"))
+
+SYNC_LOCK_KEY = "flowsaas:sync_all_users:lock"
+SYNC_METRICS_KEY = "flowsaas:sync_all_users:last_run"
+
 @shared_task
 def sync_all_users_executions():
     """
     Periodic task to sync n8n executions for all active users.
     Should run every 5 minutes via Celery Beat.
+    In global mode reads new executions once for all workflows; in sharded mode
+    fans out into SYNC_SHARDS subtasks by user-id hash. A Redis lock keeps runs
+    from overlapping when one takes longer than the beat interval.
     """
+    token = acquire_lock(SYNC_LOCK_KEY, SYNC_LOCK_TTL_SECONDS)
+    if token is None:
+        print("⏭️ Previous execution sync still running, skipping this run")
+        return None
+
+    if SYNC_MODE == "global":
+        started = time.time()
+        return finish_sync_run([sync_global_pass(token)], token, started)
+
+    try:
+        shards = [sync_users_shard.s(shard, SYNC_SHARDS, token) for shard in range(SYNC_SHARDS)]
+        chord(shards)(finish_sync_run.s(token, time.time()))
+    except Exception:
+        release_lock(SYNC_LOCK_KEY, token)
+        raise
+    return SYNC_SHARDS
+
+
+def _lock_heartbeat(token: str):
+    """Callable that extends the run lock; False once the lock is no longer ours."""
+    def heartbeat() -> bool:
+        try:
+            return extend_lock(SYNC_LOCK_KEY, token, SYNC_LOCK_TTL_SECONDS)
+        except Exception as e:
+            # Redis hiccup: nobody else can take the lock through it either
+            print(f"Could not extend the sync lock: {e}")
+            return True
+    return heartbeat
+
+
+def sync_global_pass(token: str = None):
+    """Run the global sync with its own session; reports like a single shard."""
+    started = time.time()
     db = SessionLocal()
+    stats = {"rows": 0, "users": 0}
+    failed = 0
     try:
-        # Get all users with active workflow instances
-        from sqlalchemy import distinct
-        from ..models import WorkflowInstance
-        
-        active_user_ids = db.query(distinct(WorkflowInstance.user_id)).filter(
-            WorkflowInstance.is_active == True
-        ).all()
+        stats = sync_all_executions_global(db, _lock_heartbeat(token) if token else None)
+    except Exception as sync_error:
+        db.rollback()
+        failed = 1
+        print(f"Global execution sync failed: {sync_error}")
+    finally:
+        db.close()
+
+    return {
+        "shard": 0,
+        "users": stats["users"],
+        "failed": failed,
+        "rows": stats["rows"],
+        "duration_ms": round((time.time() - started) * 1000)
+    }
+
+
+@shared_task
+def sync_users_shard(shard: int, shards: int, token: str = None):
+    """
+    Sync every user with active workflow instances whose id hashes into this shard.
+    Uses its own session; each user's sync commits on its own. With the run's lock
+    token, the lock is extended after every user.
+    """
+    heartbeat = _lock_heartbeat(token) if token else None
+    started = time.time()
+    db = SessionLocal()
+    synced_users = 0
+    failed_users = 0
+    rows = 0
+    try:
+        from sqlalchemy import text
+
+        # Stable hash range split, computed in the database
+        active_user_ids = db.execute(text("""
+            SELECT DISTINCT user_id
+            FROM workflow_instances
+            WHERE is_active = TRUE
+              AND user_id IS NOT NULL
+              AND (hashtext(user_id::text) & 2147483647) % :shards = :shard
+        """), {"shards": shards, "shard": shard}).fetchall()
         
-        synced_count = 0
         for (user_id,) in active_user_ids:
             try:
-                sync_executions_for_user(user_id, db)
-                synced_count += 1
+                rows += sync_executions_for_user(user_id, db)
+                synced_users += 1
             except Exception as user_error:
+                db.rollback()
+                failed_users += 1
                 print(f"Failed to sync user {user_id}: {user_error}")
-                continue
-        
-        print(f"✅ Synced executions for {synced_count} users")
-        return synced_count
-        
+            if heartbeat is not None and not heartbeat():
+                print(f"Sync shard {shard}/{shards}: run lock lost, stopping")
+                break
+    except Exception as shard_error:
+        # Report instead of raising so the chord callback still releases the lock
+        print(f"Sync shard {shard}/{shards} failed: {shard_error}")
+        failed_users += 1
     finally:
         db.close()
 
+    return {
+        "shard": shard,
+        "users": synced_users,
+        "failed": failed_users,
+        "rows": rows,
+        "duration_ms": round((time.time() - started) * 1000)
+    }
+
+
+@shared_task
+def finish_sync_run(results, token: str, started_at: float):
+    """Chord callback: release the run lock and publish the run's metrics."""
+    release_lock(SYNC_LOCK_KEY, token)
+
+    metrics = {
+        "duration_ms": round((time.time() - started_at) * 1000),
+        "shards": len(results),
+        "users": sum(r["users"] for r in results),
+        "failed_users": sum(r["failed"] for r in results),
+        "rows": sum(r["rows"] for r in results),
+        "slowest_shard_ms": max((r["duration_ms"] for r in results), default=0),
+        "finished_at": int(time.time()),
+    }
+    try:
+        get_redis().hset(SYNC_METRICS_KEY, mapping=metrics)
+    except Exception as e:
+        print(f"Could not store sync metrics: {e}")
+
+    print(
+        f"✅ Synced executions for {metrics['users']} users "
+        f"({metrics['rows']} rows, {metrics['failed_users']} failed) "
+        f"in {metrics['duration_ms']} ms across {metrics['shards']} shards"
+    )
+    return metrics
+
 
 @shared_task
 def sync_user_executions(user_id: str):
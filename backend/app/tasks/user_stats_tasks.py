@@ -0,0 +1,18 @@
+# backend/app/tasks/user_stats_tasks.py
+from celery import shared_task
+from ..database import SessionLocal
+from ..services.user_stats import reconcile_user_stats
+
+@shared_task
+def reconcile_user_stats_task():
+    """
+    Periodic task that checks the /auth/me counters against the source tables.
+    Runs hourly via Celery Beat.
+    """
+    db = SessionLocal()
+    try:
+        fixed = reconcile_user_stats(db)
+        print(f"✅ Verified user stats, repaired {fixed} rows")
+        return fixed
+    finally:
+        db.close()
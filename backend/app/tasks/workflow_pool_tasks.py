@@ -0,0 +1,20 @@
+# backend/app/tasks/workflow_pool_tasks.py
+from celery import shared_task
+from ..database import SessionLocal
+from ..services.workflow_pool import workflow_pool
+
+@shared_task
+def gc_idle_workflow_instances():
+    """
+    Periodic task that removes pooled n8n workflows nobody has used recently.
+    Runs hourly via Celery Beat.
+    """
+    from ..worker import run_async
+
+    db = SessionLocal()
+    try:
+        removed = run_async(workflow_pool.gc_idle(db))
+        print(f"✅ Removed {removed} idle pooled workflows")
+        return removed
+    finally:
+        db.close()
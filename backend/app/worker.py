@@ -1,6 +1,8 @@
 # backend/app/worker.py
 import os
+import asyncio
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_shutdown
 import time
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
@@ -8,7 +10,8 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 celery_app = Celery(
     "flowsaas_worker",
     broker=REDIS_URL,
-    backend=REDIS_URL
+    backend=REDIS_URL,
+    include=["app.tasks.sync_tasks", "app.tasks.workflow_pool_tasks", "app.tasks.user_stats_tasks"]
 )
 
 celery_app.conf.update(
@@ -20,15 +23,49 @@ celery_app.conf.update(
     task_routes={
         "app.worker.execute_workflow_task": "main-queue",
         "app.tasks.sync_tasks.sync_all_users_executions": "main-queue",
+        "app.tasks.sync_tasks.sync_users_shard": "main-queue",
+        "app.tasks.sync_tasks.finish_sync_run": "main-queue",
+        "app.tasks.workflow_pool_tasks.gc_idle_workflow_instances": "main-queue",
+        "app.tasks.user_stats_tasks.reconcile_user_stats_task": "main-queue",
     },
     beat_schedule={
         'sync-executions-every-5-minutes': {
             'task': 'app.tasks.sync_tasks.sync_all_users_executions',
             'schedule': 300.0,  # Every 5 minutes (300 seconds)
         },
+        'gc-idle-workflow-instances-hourly': {
+            'task': 'app.tasks.workflow_pool_tasks.gc_idle_workflow_instances',
+            'schedule': 3600.0,  # Every hour
+        },
+        'reconcile-user-stats-hourly': {
+            'task': 'app.tasks.user_stats_tasks.reconcile_user_stats_task',
+            'schedule': 3600.0,  # Every hour
+        },
     }
 )
 
+# One event loop per worker process, so the shared n8n client keeps its
+# pooled connections between tasks instead of reconnecting every time
+_loop = None
+
+def run_async(coro):
+    """Run a coroutine from a Celery task on the worker's persistent event loop."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_async_resources(**kwargs):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    from .services.n8n_client import n8n_client
+    _loop.run_until_complete(n8n_client.aclose())
+    _loop.close()
+    _loop = None
+
 @celery_app.task(bind=True, max_retries=3)
 def execute_workflow_task(self, workflow_instance_id: str, user_id: str, cost: int = 1):
     """
@@ -60,8 +97,7 @@ def execute_workflow_task(self, workflow_instance_id: str, user_id: str, cost: i
         # 3. Trigger n8n (Async wrapper needed for Celery)
         # Note: In production, n8n trigger should be an ID or webhook. 
         # Here we mock user workflow activation.
-        # loop = asyncio.get_event_loop()
-        # loop.run_until_complete(n8n_client.activate_workflow("some_n8n_id"))
+        # run_async(n8n_client.activate_workflow("some_n8n_id"))
         
         print(f"Executing workflow {workflow_instance_id} for user {user_id}")
         time.sleep(2) # Mock execution time
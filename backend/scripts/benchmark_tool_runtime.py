@@ -0,0 +1,40 @@
+# backend/scripts/benchmark_tool_runtime.py
+# Micro-benchmark for the free-tool runtime: one-time bootstrap cost vs per-call overhead.
+# Usage: python scripts/benchmark_tool_runtime.py [iterations]
+import sys
+import os
+import time
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import tool_executor
+
+TOOL_CODE = """def execute(input_data: str):
+    return {"success": True, "output": input_data.upper()}"""
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    started = time.perf_counter()
+    bootstrap_seconds = tool_executor.bootstrap_tool_runtime()
+    print(f"Bootstrap (shims + base namespace): {bootstrap_seconds * 1000:.2f} ms "
+          f"(wall {(time.perf_counter() - started) * 1000:.2f} ms)")
+
+    namespace_us = timeit.timeit(tool_executor._new_namespace, number=iterations) / iterations * 1e6
+    print(f"Namespace copy per call:            {namespace_us:.2f} us")
+
+    uncached = timeit.timeit(
+        lambda: tool_executor.execute_tool(TOOL_CODE, input_data="hello"),
+        number=iterations
+    ) / iterations * 1e6
+    print(f"execute_tool, no cache:             {uncached:.2f} us/call")
+
+    cached = timeit.timeit(
+        lambda: tool_executor.execute_tool(TOOL_CODE, "benchmark-tool", input_data="hello"),
+        number=iterations
+    ) / iterations * 1e6
+    print(f"execute_tool, cached by tool id:    {cached:.2f} us/call")
+
+if __name__ == "__main__":
+    main()